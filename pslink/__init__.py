@@ -209,6 +209,16 @@ quant.VolumeFormula.register(
 )
 
 
-def link(data_dir: str):
-    lin = pslink.linker.Linker(data_dir)
+def link(data_dir: str, workers=1, prefetch_materials=False, io_threads=1,
+         cache_components=False, incremental=False, streaming=False,
+         pack_threads=1, pack_level=-1, aggregate_inputs=True):
+    lin = pslink.linker.Linker(data_dir, workers=workers,
+                               prefetch_materials=prefetch_materials,
+                               io_threads=io_threads,
+                               cache_components=cache_components,
+                               incremental=incremental,
+                               streaming=streaming,
+                               pack_threads=pack_threads,
+                               pack_level=pack_level,
+                               aggregate_inputs=aggregate_inputs)
     lin.run()
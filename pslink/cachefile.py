@@ -0,0 +1,70 @@
+"""
+This module contains functions for reading and writing the cache files in the
+`out` folder of a data folder (e.g. the linked products, the component
+attributes, or the material inputs). A cache file contains a version number
+together with the cached data. The version number of a cache format should be
+incremented when the format or the calculation of the cached data changes;
+cache files with another version are then ignored and rebuilt.
+"""
+
+import json
+import logging as log
+import os
+import pickle
+
+from typing import Optional
+
+
+def make_folder(fpath: str):
+    """ Creates the folder of the given file if it does not exist yet. """
+    folder = os.path.dirname(fpath)
+    if folder != "":
+        os.makedirs(folder, exist_ok=True)
+
+
+def read(fpath: str, version: int):
+    """ Reads the data from the given cache file. It returns `None` if the
+        file does not exist, could not be read, or has another version. """
+    if not os.path.isfile(fpath):
+        return None
+    try:
+        with open(fpath, "rb") as f:
+            content = pickle.load(f)
+    except Exception as e:
+        log.warning("failed to read cache file %s: %s", fpath, e)
+        return None
+    if not isinstance(content, tuple) or len(content) != 2 \
+            or content[0] != version:
+        return None
+    return content[1]
+
+
+def write(fpath: str, version: int, data):
+    """ Writes the given data with the given version into a cache file. """
+    make_folder(fpath)
+    with open(fpath, "wb") as f:
+        pickle.dump((version, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_json(fpath: str, version: int) -> Optional[dict]:
+    """ Reads a JSON object with a `version` field from the given file. It
+        returns `None` if the file does not exist, could not be read, or has
+        another version. """
+    if not os.path.isfile(fpath):
+        return None
+    try:
+        with open(fpath, "r", encoding="utf-8") as f:
+            obj = json.load(f)
+    except Exception as e:
+        log.warning("failed to read file %s: %s", fpath, e)
+        return None
+    if not isinstance(obj, dict) or obj.get("version") != version:
+        return None
+    return obj
+
+
+def write_json(fpath: str, obj: dict):
+    """ Writes the given JSON object into the given file. """
+    make_folder(fpath)
+    with open(fpath, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=1, sort_keys=True)
@@ -0,0 +1,109 @@
+"""
+This module contains a store for the component files of a data folder. The
+store scans the `components` folder once and keeps an index of the available
+component IDs with the sizes and modification times of their files. Thus, a
+lookup of a part without a component file does not touch the file system.
+Optionally, the attributes of all component files can be packed into a single
+cache file that is only rebuilt when the files in the folder change.
+"""
+
+import logging as log
+import os
+
+import pslink.cachefile as cachefile
+import pslink.partatts as partatts
+
+from typing import Optional
+
+# the version of the component cache files
+_VERSION = 2
+
+
+class ComponentStore(object):
+
+    def __init__(self, folder: str, encoding="utf-8"):
+        self.folder = folder
+        self.encoding = encoding
+        # component ID -> (path, size, mtime in ns) of the component files
+        self._files = {}
+        # component ID -> attributes; filled when a cache file is used
+        self._atts = {}
+        self._scan()
+
+    def _scan(self):
+        if not os.path.isdir(self.folder):
+            log.info("no component folder %s found", self.folder)
+            return
+        with os.scandir(self.folder) as entries:
+            for entry in entries:  # type: os.DirEntry
+                if not entry.name.endswith(".txt") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                self._files[entry.name[0:-4]] = (
+                    entry.path, stat.st_size, stat.st_mtime_ns)
+        log.info("found %i component files in %s",
+                 len(self._files), self.folder)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._files
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def ids(self) -> list:
+        """ Returns the sorted IDs of the components in this store. """
+        return sorted(self._files.keys())
+
+    def path(self, uid: str) -> Optional[str]:
+        """ Returns the path of the component file with the given ID or `None`
+            if there is no such file. """
+        f = self._files.get(uid)
+        return None if f is None else f[0]
+
+    def stat(self, uid: str) -> Optional[tuple]:
+        """ Returns the `(size, mtime)` tuple of the component file with the
+            given ID or `None` if there is no such file. """
+        f = self._files.get(uid)
+        return None if f is None else (f[1], f[2])
+
+    def get(self, uid: str) -> Optional[dict]:
+        """ Returns the attributes of the component with the given ID or `None`
+            if there is no component file for that ID. """
+        atts = self._atts.get(uid)
+        if atts is not None:
+            return atts
+        f = self._files.get(uid)
+        if f is None:
+            return None
+        return partatts.from_file(f[0], encoding=self.encoding)
+
+    def signature(self) -> list:
+        """ Returns the sorted list of `(ID, size, mtime)` tuples of the
+            component files. When a component file is added, removed, or
+            modified, the signature changes. """
+        return sorted((uid, f[1], f[2]) for uid, f in self._files.items())
+
+    def use_cache(self, fpath: str):
+        """ Loads the attributes of all component files from the given cache
+            file. If the cache file does not exist or does not match the
+            signature of the component files, the attributes are read from the
+            component files and the cache file is rebuilt. """
+        signature = self.signature()
+        if self._read_cache(fpath, signature):
+            log.info("loaded %i components from cache %s",
+                     len(self._atts), fpath)
+            return
+        self._atts = {uid: partatts.from_file(f[0], encoding=self.encoding)
+                      for uid, f in self._files.items()}
+        cachefile.write(fpath, _VERSION, (signature, self._atts))
+        log.info("wrote %i components to cache %s", len(self._atts), fpath)
+
+    def _read_cache(self, fpath: str, signature: list) -> bool:
+        content = cachefile.read(fpath, _VERSION)
+        if content is None:
+            return False
+        sig, atts = content
+        if sig != signature:
+            return False
+        self._atts = atts
+        return True
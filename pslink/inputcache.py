@@ -0,0 +1,102 @@
+"""
+This module contains a cache for the material inputs of components. Many
+components share the same attributes (e.g. the same bolt specification from
+different suppliers) and thus the same material inputs. The cache stores the
+material inputs under a fingerprint of the normalized attributes so that they
+are only calculated once for each distinct attribute set. The cache can be
+stored in a file and is only loaded again when the material densities and
+aliases and the registered volume formulas are the same as in the run that
+created it.
+"""
+
+import hashlib
+
+import pslink.cachefile as cachefile
+import pslink.partatts as partatts
+import pslink.quant as quant
+
+# the version of the material input cache files; it also needs to be
+# incremented when the calculation of the material inputs changes
+_VERSION = 3
+
+
+class InputCache(object):
+
+    def __init__(self, densities: dict, aliases: dict = None):
+        self.densities = densities
+        # the material names are resolved with the same resolver for all
+        # attribute sets
+        self.resolver = partatts.MaterialResolver(densities, aliases)
+        self.version = version(densities, aliases)
+        # attribute fingerprint -> tuple of (material, kg) tuples
+        self._inputs = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._inputs)
+
+    def material_inputs(self, atts: dict) -> list:
+        """ Returns the material inputs for the given attributes, see
+            `partatts.material_inputs`. """
+        key = fingerprint(atts)
+        inputs = self._inputs.get(key)
+        if inputs is not None:
+            self.hits += 1
+            return list(inputs)
+        self.misses += 1
+        inputs = partatts.material_inputs(atts, self.resolver)
+        self._inputs[key] = tuple(inputs)
+        return inputs
+
+    def hit_rate(self) -> float:
+        """ Returns the share of the lookups that were answered from the
+            cache. """
+        total = self.hits + self.misses
+        return 0.0 if total == 0 else self.hits / total
+
+    def read(self, fpath: str) -> bool:
+        """ Loads the cached material inputs from the given file. It returns
+            `True` if the file was created with the same densities, aliases,
+            and volume formulas. """
+        content = cachefile.read(fpath, _VERSION)
+        if content is None:
+            return False
+        v, inputs = content
+        if v != self.version:
+            return False
+        self._inputs.update(inputs)
+        return True
+
+    def write(self, fpath: str):
+        """ Writes the cached material inputs to the given file. """
+        cachefile.write(fpath, _VERSION, (self.version, self._inputs))
+
+
+def fingerprint(atts: dict) -> bytes:
+    """ Calculates the fingerprint of the given attributes. The attribute
+        names are normalized like in `quant` and `partatts` (case and
+        surrounding whitespace are ignored). As the first binding of an
+        attribute wins in a volume formula, the attributes are only sorted
+        when the normalized names are unique. """
+    items = [(k.strip().lower(), v.strip()) for k, v in atts.items()]
+    if len(set(k for k, _ in items)) == len(items):
+        items.sort()
+    return hashlib.blake2b(repr(items).encode("utf-8"),
+                           digest_size=16).digest()
+
+
+def version(densities: dict, aliases: dict = None) -> str:
+    """ Calculates a hash of the given densities and aliases and the
+        registered volume formulas. """
+    h = hashlib.sha256()
+    h.update(("pslink/inputcache/%i\n" % _VERSION).encode("utf-8"))
+    for mat, dens in sorted(densities.items()):
+        h.update(("%s=%r\n" % (mat, dens)).encode("utf-8"))
+    if aliases is not None:
+        for alias, mat in sorted(aliases.items()):
+            h.update(("%s->%s\n" % (alias, mat)).encode("utf-8"))
+    for f in quant.VolumeFormula._formulas:  # type: quant.VolumeFormula
+        h.update(("%r:%s\n" % (sorted(f.attributes.items()),
+                               f.formula)).encode("utf-8"))
+    return h.hexdigest()
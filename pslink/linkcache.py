@@ -0,0 +1,64 @@
+"""
+This module contains functions for caching the links between the nodes of a
+product graph and the background products. The cache is stored in a file
+together with a key that is calculated from the content of the input files,
+the stopwords, and the matcher that was used for linking the products. Thus,
+when nothing changed, the links can be loaded from the cache instead of
+running `Graph.link_products` again.
+"""
+
+import hashlib
+
+import pslink.cachefile as cachefile
+import pslink.semap as semap
+import pslink.symap as symap
+
+# the version of the link cache files; it is also part of the cache key
+_VERSION = 2
+
+
+def key(graph_file: str, products_file: str,
+        matcher=symap.compare_with_lci_name) -> str:
+    """ Calculates the cache key for linking the products of the given file
+        to the graph of the given file. """
+    h = hashlib.sha256()
+    h.update(("pslink/linkcache/%i\n" % _VERSION).encode("utf-8"))
+    for fpath in (graph_file, products_file):
+        with open(fpath, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+        h.update(b"\n")
+    for w in sorted(symap.stopwords()):
+        h.update(w.encode("utf-8"))
+        h.update(b"\n")
+    h.update(("%s.%s" % (matcher.__module__,
+                         matcher.__qualname__)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def write(fpath: str, cache_key: str, g: semap.Graph, infos: list):
+    """ Writes the linked products of the given graph into the given cache
+        file. The products are stored as positions in the given list. """
+    positions = {id(info): pos for pos, info in enumerate(infos)}
+    links = []
+    for node, products in g._product_infos.items():
+        links.append((node,
+                      [positions[id(p)] for p in products],
+                      g._syn_factors.get(node, 0.0)))
+    cachefile.write(fpath, _VERSION, (cache_key, len(infos), links))
+
+
+def read(fpath: str, cache_key: str, g: semap.Graph, infos: list) -> bool:
+    """ Tries to read the linked products for the given graph and product
+        list from the given cache file. It returns `True` if the cache file
+        matched the given key and the links were added to the graph. """
+    content = cachefile.read(fpath, _VERSION)
+    if content is None:
+        return False
+    k, count, links = content
+    if k != cache_key or count != len(infos):
+        return False
+    for node, positions, syn_factor in links:
+        g._product_infos[node] = [infos[pos] for pos in positions]
+        g._syn_factors[node] = syn_factor
+    return True
@@ -1,24 +1,84 @@
-import glob
+import concurrent.futures
+import hashlib
+import json
 import logging as log
 import os
 import uuid
+import zipfile
 
 import olca
-import olca.pack
-import xlrd
 
 import pslink.backs as backs
+import pslink.components as components
+import pslink.inputcache as inputcache
+import pslink.linkcache as linkcache
+import pslink.manifest as manifest
+import pslink.pack as pack
 import pslink.semap as semap
 import pslink.partatts as partatts
+import pslink.trees as trees
 
 from typing import Optional
 
 
 class Linker(object):
 
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, workers=1, prefetch_materials=False,
+                 io_threads=1, cache_components=False, incremental=False,
+                 streaming=False, pack_threads=1, pack_level=-1,
+                 aggregate_inputs=True):
         self.data_dir = data_dir
+        # the number of processes for linking the background products and
+        # for parsing the component tree files
+        self.workers = workers
+        # if true, the background products of the materials of all parts in
+        # the component trees are searched in one batch before the processes
+        # are created
+        self.prefetch_materials = prefetch_materials
+        # the number of threads for reading the component files; if it is
+        # larger than 1, the component files of all parts are read
+        # concurrently before the processes are created (the tree files are
+        # then read into memory instead of being streamed)
+        self.io_threads = io_threads
+        # part ID -> attributes of the component files that were read in
+        # advance; the attributes are `None` when a part has no file
+        self.component_atts = {}
+        # if true, the attributes of all component files are loaded from a
+        # packed cache file that is rebuilt when the component files change
+        self.cache_components = cache_components
+        self.components = None  # type: Optional[components.ComponentStore]
+        # if true, only the processes with changed inputs are rebuilt; the
+        # others are copied from the package of the previous run
+        self.incremental = incremental
+        # the manifests of the previous and current run in incremental runs
+        self.prev_manifest = None  # type: Optional[manifest.Manifest]
+        self.manifest = None  # type: Optional[manifest.Manifest]
+        # the package of the previous run in an incremental run
+        self.prev_pack = None  # type: Optional[zipfile.ZipFile]
+        # the member names of the package of the previous run
+        self.prev_pack_names = set()
+        # the IDs of the processes that are copied from the previous package
+        self.reused_processes = set()
+        # if true, the products are written directly and a process is written
+        # as soon as the last row that adds an input to it was parsed; the
+        # positions of these rows are collected in a first pass over the
+        # rows so that only the IDs of the parts and the open processes are
+        # kept in memory
+        self.streaming = streaming
+        # parent ID -> position of the last row with that parent (streaming)
+        self.last_child_rows = {}
+        # the position of the current row over all sheets (streaming)
+        self.row_position = 0
+        # the IDs of all created parts
+        self.part_ids = set()
+        # the number of written and copied processes
+        self.written_processes = 0
+        self.copied_processes = 0
         self.densities = {}
+        # optional aliases of material names: alias -> material
+        self.aliases = {}
+        # the cache of the material inputs of the component attributes
+        self.input_cache = None  # type: Optional[inputcache.InputCache]
         self.created_processes = {}
         self.created_products = {}
         self.created_materials = {}
@@ -32,7 +92,19 @@ class Linker(object):
         self.component_category = None  # type: Optional[olca.Ref]
         self.material_category = None  # type: Optional[olca.Ref]
 
-        self.writer = None  # type: Optional[olca.pack.Writer]
+        # if true, the inputs of a process with the same flow and provider are
+        # merged into a single exchange with the summed amounts; otherwise,
+        # each row of a child component results in a separate input
+        self.aggregate_inputs = aggregate_inputs
+        # part ID -> {(flow ID, provider ID) -> input} of the processes that
+        # are not completed yet, for merging the inputs of these processes
+        self.input_index = {}
+        # the number of threads for compressing the JSON documents of the
+        # generated package and the compression level of the documents;
+        # -1 is the default level of zlib and 0 means no compression
+        self.pack_threads = pack_threads
+        self.pack_level = pack_level
+        self.writer = None  # type: Optional[pack.Writer]
 
     def run(self):
 
@@ -46,6 +118,14 @@ class Linker(object):
             self.densities[mat.lower().strip()] = float(dens.strip())
         log.info("found %i material densities" % len(self.densities))
 
+        # read the optional aliases of the material names
+        apath = os.path.join(self.data_dir, "material_aliases.txt")
+        if os.path.exists(apath):
+            log.info("read material aliases from %s", apath)
+            for alias, mat in partatts.from_file(apath).items():
+                self.aliases[alias.lower().strip()] = mat.lower().strip()
+            log.info("found %i material aliases" % len(self.aliases))
+
         # read the background products
         bpath = os.path.join(self.data_dir, "background_products.txt")
         if not os.path.exists(bpath):
@@ -62,121 +142,252 @@ class Linker(object):
             return
         log.info("read product graph from %s", gpath)
         self.g = semap.read_file(gpath)
-        self.g.link_products(background_products)
+        cpath = os.path.join(self.data_dir, "out", "linked_products.cache")
+        ckey = linkcache.key(gpath, bpath)
+        if linkcache.read(cpath, ckey, self.g, background_products):
+            log.info("loaded linked products from cache %s", cpath)
+        else:
+            self.g.link_products(background_products, workers=self.workers)
+            linkcache.write(cpath, ckey, self.g, background_products)
+            log.info("wrote linked products to cache %s", cpath)
         log.info("created graph with %i nodes and %i edges",
                  len(self.g.nodes), len(self.g.edges))
         gpath = os.path.join(self.data_dir, "out", "linked_graph.semapl")
         semap.write_file(self.g, gpath)
         log.info("dumped graph with linked products to %s", gpath)
 
-        # collect the XLSX files from the data folder
-        xpath = self.data_dir
-        if not xpath.endswith("/") and not xpath.endswith("\\"):
-            xpath += "/"
-        xpath += "*.xlsx"
-        xlsx_files = glob.glob(xpath)
-        if len(xlsx_files) == 0:
-            log.error("no xlsx files found in %s", self.data_dir)
+        # collect the component tree files (XLSX, CSV, etc.) from the data
+        # folder
+        tree_files = trees.find_files(self.data_dir)
+        if len(tree_files) == 0:
+            log.error("no component tree files found in %s", self.data_dir)
             return
-        log.info("found %i xlsx files", len(xlsx_files))
+        log.info("found %i component tree files", len(tree_files))
+
+        # in an incremental run, read the manifest of the previous run; the
+        # manifest is only used when the global inputs did not change
+        mpath = os.path.join(self.data_dir, "out", "manifest.json")
+        if self.incremental:
+            self.manifest = manifest.Manifest(
+                manifest.key(ckey, manifest.file_hash(dpath),
+                             manifest.fingerprint(self.aliases),
+                             "aggregate_inputs=%s" % self.aggregate_inputs))
+            self.prev_manifest = manifest.read(mpath)
+            if self.prev_manifest.key != self.manifest.key:
+                log.info("global inputs changed; rebuild all processes")
+                self.prev_manifest.processes = {}
+                self.prev_manifest.materials = {}
+            for mid, m in self.prev_manifest.materials.items():
+                self.matched_products[mid] = [
+                    backs.ProductInfo(process_uuid=proc, product_uuid=prod)
+                    for proc, prod in m["matches"]]
+
+        # load the cached material inputs of the component attributes
+        ipath = os.path.join(self.data_dir, "out", "material_inputs.cache")
+        self.input_cache = inputcache.InputCache(self.densities,
+                                                self.aliases)
+        if self.input_cache.read(ipath):
+            log.info("loaded %i material inputs from cache %s",
+                     len(self.input_cache), ipath)
+
+        # index the component files
+        self.components = components.ComponentStore(
+            os.path.join(self.data_dir, "components"))
+        if self.cache_components:
+            self.components.use_cache(
+                os.path.join(self.data_dir, "out", "components.cache"))
+
+        # with multiple workers, the files are parsed in parallel into
+        # memory; otherwise the rows are streamed from the files. For
+        # prefetching the components and materials, the part IDs of all rows
+        # are needed before the processes are created; the files are then
+        # read into memory so that they are only read once
+        prefetch = self.io_threads > 1 or self.prefetch_materials
+        sheets = None
+        if (self.workers > 1 and len(tree_files) > 1) or prefetch:
+            sheets = trees.read_all(tree_files, workers=self.workers)
+
+        # prefetch the components and materials of the parts in the trees
+        if prefetch:
+            uids = self.__tree_part_ids(sheets)
+            if self.io_threads > 1:
+                self.__prefetch_components(uids)
+            if self.prefetch_materials:
+                self.__prefetch_materials(uids)
 
         # initialize the pack writer
         fpath = os.path.join(self.data_dir, "out", "generated_jsonld.zip")
+        ppath = fpath + ".prev"
         if os.path.exists(fpath):
-            log.warning("file %s already exists and will be overwritten", fpath)
-            os.remove(fpath)
-        self.writer = olca.pack.Writer(fpath)
+            if self.incremental and len(self.prev_manifest.processes) > 0:
+                os.replace(fpath, ppath)
+                self.prev_pack = zipfile.ZipFile(ppath, mode="r")
+                self.prev_pack_names = set(self.prev_pack.namelist())
+            else:
+                log.warning("file %s already exists and will be overwritten",
+                            fpath)
+                os.remove(fpath)
+        self.writer = pack.Writer(fpath, threads=self.pack_threads,
+                                  level=self.pack_level)
         self.__init_write_categories()
 
-        for xlsx in xlsx_files:
-            self.__parse_xlsx(xlsx)
+        if self.streaming:
+            self.last_child_rows = _last_child_rows(
+                sheets if sheets is not None else trees.iter_all(tree_files))
+        for sheet in sheets if sheets is not None \
+                else trees.iter_all(tree_files):
+            self.__parse_sheet(sheet)
+        for uid, process in self.created_processes.items():
+            self.__complete_process(uid, process)
         self.__write_data()
+        if self.incremental:
+            manifest.write(self.manifest, mpath)
+        self.input_cache.write(ipath)
+        log.info("material input cache: %i hits, %i misses (%.1f%% hit rate)",
+                 self.input_cache.hits, self.input_cache.misses,
+                 100 * self.input_cache.hit_rate())
+        if self.prev_pack is not None:
+            self.prev_pack.close()
+            os.remove(ppath)
 
     def __init_write_categories(self):
         log.info("write categories")
         root = olca.Category()
         root.name = "Root components"
-        root.id = str(uuid.uuid4())
+        root.id = self.__category_id(root.name)
         root.model_type = olca.ModelType.PROCESS
         self.writer.write(root)
         self.root_part_category = olca.ref(olca.Category, root.id)
 
         used = olca.Category()
         used.name = "Used components"
-        used.id = str(uuid.uuid4())
+        used.id = self.__category_id(used.name)
         used.model_type = olca.ModelType.PROCESS
         self.writer.write(used)
         self.used_part_category = olca.ref(olca.Category, used.id)
 
         components = olca.Category()
         components.name = "Components"
-        components.id = str(uuid.uuid4())
+        components.id = self.__category_id(components.name)
         components.model_type = olca.ModelType.FLOW
         self.writer.write(components)
         self.component_category = olca.ref(olca.Category, components.id)
 
         materials = olca.Category()
         materials.name = "Materials"
-        materials.id = str(uuid.uuid4())
+        materials.id = self.__category_id(materials.name)
         materials.model_type = olca.ModelType.FLOW
         self.writer.write(materials)
         self.material_category = olca.ref(olca.Category, materials.id)
 
+    def __category_id(self, name: str) -> str:
+        """ Returns the ID of the category with the given name. In incremental
+            runs, the IDs of the previous run are used so that the copied
+            processes still refer to existing categories. """
+        uid = None
+        if self.prev_manifest is not None:
+            uid = self.prev_manifest.categories.get(name)
+        if uid is None:
+            uid = str(uuid.uuid4())
+        if self.manifest is not None:
+            self.manifest.categories[name] = uid
+        return uid
+
     def __write_data(self):
         log.info("write generated data")
         for product in self.created_products.values():
             self.writer.write(product)
         for process in self.created_processes.values():
-            self.writer.write(process)
+            self.__write_process(process)
+        if self.incremental:
+            log.info("copied %i of %i processes from the previous run",
+                     self.copied_processes, self.written_processes)
+        if self.manifest is not None:
+            for uid, material in self.created_materials.items():
+                self.manifest.materials[uid] = {
+                    "name": material.name,
+                    "matches": [[m.process_uuid, m.product_uuid]
+                                for m in self.matched_products[uid]]}
         for material in self.created_materials.values():
             self.writer.write(material)
         self.writer.close()
 
-    def __parse_xlsx(self, xpath: str):
-        log.info("parse XLSX file %s", xpath)
-        wb = xlrd.open_workbook(xpath)
-        for sheet_name in wb.sheet_names():
-            log.info("parse sheet %s", sheet_name)
-            sheet = wb.sheet_by_name(sheet_name)
-            for r in range(1, sheet.nrows):
-                part_number = _cell_str(sheet, r, 1)
-                if part_number == "":
-                    break
-                uid = part_id(part_number)
-                part_name = _cell_str(sheet, r, 4)
-                parent_number = _cell_str(sheet, r, 5)
-                product = self.created_products.get(uid)
-
-                # create product and process
-                if product is None:
-                    product = self.__create_product(part_number, part_name)
+    def __parse_sheet(self, sheet: trees.TreeSheet):
+        log.info("add rows of sheet %s", sheet.key)
+        # in an incremental run, the rows are hashed for the manifest
+        rows_hash = hashlib.sha256() if self.manifest is not None else None
+        for row in sheet.rows:  # type: trees.TreeRow
+            self.row_position += 1
+            if rows_hash is not None:
+                rows_hash.update(json.dumps(
+                    [row.part_number, row.name, row.parent, row.quantity]
+                ).encode("utf-8"))
+            part_number = row.part_number
+            uid = part_id(part_number)
+            parent_number = row.parent
+            puid = part_id(parent_number) if parent_number != "" else None
+
+            # create product and process
+            is_new = uid not in self.part_ids
+            if is_new:
+                self.part_ids.add(uid)
+                product = self.__create_product(part_number, row.name)
+                process = self.__create_process(product,
+                                                root=parent_number == "")
+                self.created_processes[uid] = process
+                if self.streaming:
+                    self.writer.write(product)
+                else:
                     self.created_products[uid] = product
-                    process = self.__create_process(product,
-                                                    root=parent_number == "")
-                    self.__infer_inputs(part_number, process)
-                    self.created_processes[uid] = process
-
-                # create input in parent component
-                if parent_number != "":
-                    puid = part_id(parent_number)
-                    parent = self.created_processes.get(puid)
-                    if parent is None:
+
+            # create input in parent component
+            parent = None
+            if puid is not None:
+                parent = self.created_processes.get(puid)
+                if parent is None:
+                    if puid in self.part_ids:
+                        log.warning("process of %s was already written;" +
+                                    " ignored input %s", parent_number,
+                                    part_number)
+                    else:
                         log.warning("Unknown parent link: %s => %s",
                                     part_number, parent_number)
-                        continue
-                    inp = olca.Exchange()
-                    inp.amount = 1.0
-                    try:
-                        inp.amount = float(_cell_str(sheet, r, 3))
-                    except ValueError:
-                        log.warning("not a numeric quantity," +
-                                    "default to 1.0; sheet=%s, row=%i",
-                                    sheet_name, r)
-                    inp.input = True
-                    inp.flow = olca.ref(olca.Flow, product.id)
-                    inp.default_provider = olca.ref(
-                        olca.Process, "proc_" + product.id)
-                    parent.exchanges.append(inp)
+            if parent is not None:
+                amount = 1.0
+                try:
+                    amount = float(row.quantity)
+                except ValueError:
+                    log.warning("not a numeric quantity," +
+                                "default to 1.0; sheet=%s, row=%i",
+                                sheet.name, row.row)
+                index = None
+                if self.aggregate_inputs:
+                    index = self.input_index.get(puid)
+                    if index is None:
+                        index = {}
+                        self.input_index[puid] = index
+                _add_input(parent.exchanges, index, uid, "proc_" + uid,
+                           amount)
+
+            # in streaming mode, write the processes that get no further
+            # inputs: a new part without later child rows and the parent
+            # when this was its last child row
+            if self.streaming:
+                pos = self.row_position
+                if is_new and uid in self.created_processes \
+                        and self.last_child_rows.get(uid, 0) <= pos:
+                    self.__finish_process(uid)
+                if parent is not None and puid in self.created_processes \
+                        and self.last_child_rows.get(puid) == pos:
+                    self.__finish_process(puid)
+
+        if rows_hash is None:
+            return
+        rows_hash = rows_hash.hexdigest()
+        self.manifest.sheets[sheet.key] = rows_hash
+        if len(self.prev_manifest.sheets) > 0 and \
+                self.prev_manifest.sheets.get(sheet.key) != rows_hash:
+            log.info("rows of sheet %s changed", sheet.key)
 
     def __create_product(self, number: str, name: str) -> olca.Flow:
         flow = olca.Flow()
@@ -215,47 +426,156 @@ class Linker(object):
         process.exchanges = [exchange]
         return process
 
-    def __infer_inputs(self, part_number: str, process: olca.Process):
-        part_file = self.data_dir + "/components/%s.txt" % part_id(part_number)
-        if not os.path.isfile(part_file):
-            log.info("no part data for %s", part_number)
+    def __tree_part_ids(self, sheets) -> list:
+        """ Returns the distinct IDs of the parts in the given sheets that
+            have a component file, in the order of their first occurrence. """
+        uids = []
+        handled = set()
+        for sheet in sheets:  # type: trees.TreeSheet
+            for row in sheet.rows:  # type: trees.TreeRow
+                uid = part_id(row.part_number)
+                if uid in self.components and uid not in handled:
+                    handled.add(uid)
+                    uids.append(uid)
+        return uids
+
+    def __prefetch_components(self, uids: list):
+        """ Reads the component files of the parts with the given IDs
+            concurrently in a pool of `io_threads` threads. """
+        log.info("read component files of %i parts with %i threads",
+                 len(uids), self.io_threads)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.io_threads) as pool:
+            for uid, atts in zip(uids, pool.map(self.components.get, uids)):
+                self.component_atts[uid] = atts
+
+    def __finish_process(self, uid: str):
+        """ Completes and writes the process of the part with the given ID and
+            removes it from memory (in streaming mode). """
+        process = self.created_processes.pop(uid)
+        self.__complete_process(uid, process)
+        self.__write_process(process)
+
+    def __complete_process(self, uid: str, process: olca.Process):
+        """ Infers the material inputs of the given process. In an incremental
+            run, this is skipped when the inputs of the process did not change
+            since the previous run; only its materials are created then. """
+        self.input_index.pop(uid, None)
+        if self.manifest is None:
+            self.__infer_inputs(uid, process)
             return
-        part_atts = partatts.from_file(part_file)
-        inputs = partatts.material_inputs(part_atts, self.densities)
+        fingerprint = self.__process_fingerprint(uid, process)
+        if self.prev_pack is not None:
+            prev = self.prev_manifest.processes.get(process.id)
+            path = "processes/%s.json" % process.id
+            if prev is not None and prev["hash"] == fingerprint \
+                    and path in self.prev_pack_names:
+                for mat_name in prev["materials"]:
+                    self.__get_material(mat_name)
+                self.manifest.processes[process.id] = prev
+                self.reused_processes.add(process.id)
+                return
+        materials = self.__infer_inputs(uid, process)
+        self.manifest.processes[process.id] = {
+            "hash": fingerprint, "materials": materials}
+
+    def __write_process(self, process: olca.Process):
+        """ Writes the given process or copies it from the package of the
+            previous run when its inputs did not change. """
+        self.written_processes += 1
+        if process.id in self.reused_processes:
+            path = "processes/%s.json" % process.id
+            self.writer.write_json(
+                json.loads(self.prev_pack.read(path)), "processes")
+            self.copied_processes += 1
+        else:
+            self.writer.write(process)
+
+    def __process_fingerprint(self, uid: str, process: olca.Process) -> str:
+        """ Calculates the fingerprint of the inputs of the given process: its
+            product, category, the hash of its component file, and the inputs
+            of other components. The material inputs are not created yet. """
+        component_hash = None
+        stat = self.components.stat(uid)
+        if stat is not None:
+            prev = None
+            if self.prev_manifest is not None:
+                prev = self.prev_manifest.components.get(uid)
+            if prev is not None and prev[0] == stat[0] and prev[1] == stat[1]:
+                component_hash = prev[2]
+            else:
+                component_hash = manifest.file_hash(self.components.path(uid))
+            self.manifest.components[uid] = [stat[0], stat[1], component_hash]
+        exchanges = []
+        for e in process.exchanges:  # type: olca.Exchange
+            provider = None
+            if e.default_provider is not None:
+                provider = e.default_provider.id
+            exchanges.append([e.flow.id, e.amount, e.input, provider])
+        return manifest.fingerprint([process.name, process.category.id,
+                                     component_hash, exchanges])
+
+    def __infer_inputs(self, uid: str, process: olca.Process) -> list:
+        """ Adds the material inputs of the component with the given ID to the
+            given process, directly after its reference flow. It returns the
+            names of the materials. """
+        if uid in self.component_atts:
+            part_atts = self.component_atts.pop(uid)
+        else:
+            part_atts = self.components.get(uid)
+        if part_atts is None:
+            log.info("no part data for %s", uid)
+            return []
+        inputs = self.input_cache.material_inputs(part_atts)
         if len(inputs) == 0:
-            log.info("could not extract materials from file %s", part_file)
-            return
+            log.info("could not extract materials from file %s",
+                     self.components.path(uid))
+            return []
+        exchanges = []
+        index = {} if self.aggregate_inputs else None
         for inp in inputs:
             mat_name = inp[0]  # type: str
             flow, matches = self.__get_material(mat_name)
             if len(matches) == 0:
-                e = olca.Exchange()
-                e.amount = inp[1]
-                e.input = True
-                e.flow = olca.ref(olca.Flow, flow.id)
-                process.exchanges.append(e)
+                _add_input(exchanges, index, flow.id, None, inp[1])
             else:
                 for match in matches:  # type: backs.ProductInfo
-                    e = olca.Exchange()
-                    e.amount = inp[1] / len(matches)
-                    e.input = True
-                    e.flow = olca.ref(
-                        olca.Flow, match.product_uuid)
-                    e.default_provider = olca.ref(
-                        olca.Process, match.process_uuid)
-                    process.exchanges.append(e)
+                    _add_input(exchanges, index, match.product_uuid,
+                               match.process_uuid, inp[1] / len(matches))
+        process.exchanges[1:1] = exchanges
+        return [inp[0] for inp in inputs]
+
+    def __prefetch_materials(self, uids: list):
+        """ Searches the background products of all materials of the parts
+            with the given IDs in one batch. The material inputs are stored
+            in the input cache so that they are not calculated again. """
+        names = set()
+        for uid in uids:
+            part_atts = self.component_atts.get(uid)
+            if part_atts is None:
+                part_atts = self.components.get(uid)
+            if part_atts is None:
+                continue
+            for mat_name, _ in self.input_cache.material_inputs(part_atts):
+                names.add(mat_name)
+        log.info("search background links for %i materials", len(names))
+        matches = self.g.find_products_many(sorted(names))
+        for name, products in matches.items():
+            self.matched_products[material_id(name)] = products
 
     def __get_material(self, name: str):
-        uid = str(uuid.uuid3(uuid.NAMESPACE_OID,
-                             "material/" + name.strip().lower()))
+        uid = material_id(name)
         flow = self.created_materials.get(uid)
         if flow is not None:
             return flow, self.matched_products[uid]
 
-        log.info("new material %s found; search for background links", name)
-        matches = self.g.find_products(name)
-        log.info("found %i possible matches", len(matches))
-        self.matched_products[uid] = matches
+        matches = self.matched_products.get(uid)
+        if matches is None:
+            log.info("new material %s found; search for background links",
+                     name)
+            matches = self.g.find_products(name)
+            log.info("found %i possible matches", len(matches))
+            self.matched_products[uid] = matches
 
         flow = olca.Flow()
         flow.name = name
@@ -274,14 +594,44 @@ class Linker(object):
         return flow, matches
 
 
-def _cell_str(sheet, row, col) -> str:
-    cell = sheet.cell(row, col)
-    if cell is None:
-        return ""
-    if cell.value is None:
-        return ""
-    return str(cell.value).strip()
+def _add_input(exchanges: list, index: Optional[dict], flow_id: str,
+               provider_id: Optional[str], amount: float):
+    """ Adds an input of the given flow and provider to the given exchanges.
+        If an index (flow ID, provider ID) -> exchange is given, the amount is
+        added to an existing input with the same flow and provider. """
+    if index is not None:
+        e = index.get((flow_id, provider_id))
+        if e is not None:
+            e.amount += amount
+            return
+    e = olca.Exchange()
+    e.amount = amount
+    e.input = True
+    e.flow = olca.ref(olca.Flow, flow_id)
+    if provider_id is not None:
+        e.default_provider = olca.ref(olca.Process, provider_id)
+    exchanges.append(e)
+    if index is not None:
+        index[(flow_id, provider_id)] = e
+
+
+def _last_child_rows(sheets) -> dict:
+    """ Returns a map parent ID -> position of the last row with that parent
+        over all rows of the given sheets; the rows are counted from 1. """
+    last = {}
+    pos = 0
+    for sheet in sheets:  # type: trees.TreeSheet
+        for row in sheet.rows:  # type: trees.TreeRow
+            pos += 1
+            if row.parent != "":
+                last[part_id(row.parent)] = pos
+    return last
 
 
 def part_id(part_number: str):
     return part_number.strip().replace("/", "_")
+
+
+def material_id(name: str):
+    return str(uuid.uuid3(uuid.NAMESPACE_OID,
+                          "material/" + name.strip().lower()))
@@ -0,0 +1,97 @@
+"""
+This module contains the manifest of a linking run. The manifest records
+hashes of the inputs of the generated processes (the rows of the XLSX sheets,
+the component files, and the global inputs like the densities and the product
+graph) together with the matched background products of the materials. In an
+incremental run, the manifest of the previous run is compared with the current
+inputs so that only the processes with changed inputs need to be rebuilt.
+"""
+
+import hashlib
+import json
+
+import pslink.cachefile as cachefile
+
+# the version of the manifest format; increment it when the format or the
+# way how the processes are generated changes
+_VERSION = 1
+
+
+class Manifest(object):
+
+    def __init__(self, key=""):
+        # a hash of the global inputs of a run
+        self.key = key
+        # category name -> ID of the generated categories
+        self.categories = {}
+        # "<XLSX file>/<sheet name>" -> hash of the rows of that sheet
+        self.sheets = {}
+        # component ID -> [size, mtime in ns, hash] of the component files
+        self.components = {}
+        # material ID -> {"name": ..., "matches": [[process, product], ...]}
+        # with the UUIDs of the matched background products
+        self.materials = {}
+        # process ID -> {"hash": ..., "materials": [material names]} where the
+        # hash is the fingerprint of the inputs of the process
+        self.processes = {}
+
+    def to_json(self) -> dict:
+        return {
+            "version": _VERSION,
+            "key": self.key,
+            "categories": self.categories,
+            "sheets": self.sheets,
+            "components": self.components,
+            "materials": self.materials,
+            "processes": self.processes,
+        }
+
+    @staticmethod
+    def from_json(obj: dict) -> 'Manifest':
+        m = Manifest(obj.get("key", ""))
+        m.categories = obj.get("categories", {})
+        m.sheets = obj.get("sheets", {})
+        m.components = obj.get("components", {})
+        m.materials = obj.get("materials", {})
+        m.processes = obj.get("processes", {})
+        return m
+
+
+def key(*parts: str) -> str:
+    """ Calculates the global key of a run from the given parts, e.g. the
+        link cache key and the hash of the densities file. """
+    h = hashlib.sha256()
+    h.update(("pslink/manifest/%i\n" % _VERSION).encode("utf-8"))
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def file_hash(fpath: str) -> str:
+    """ Calculates the SHA-256 hash of the content of the given file. """
+    h = hashlib.sha256()
+    with open(fpath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(obj) -> str:
+    """ Calculates a hash of the given JSON serializable object. """
+    s = json.dumps(obj, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(s.encode("utf-8")).hexdigest()
+
+
+def read(fpath: str) -> Manifest:
+    """ Reads the manifest from the given file. It returns an empty manifest
+        if the file does not exist or could not be read. """
+    obj = cachefile.read_json(fpath, _VERSION)
+    if obj is None:
+        return Manifest()
+    return Manifest.from_json(obj)
+
+
+def write(m: Manifest, fpath: str):
+    """ Writes the given manifest to the given file. """
+    cachefile.write_json(fpath, m.to_json())
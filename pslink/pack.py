@@ -0,0 +1,190 @@
+"""
+This module contains a writer for JSON-LD packages that can be used instead
+of `olca.pack.Writer`. The entities are converted to JSON in the calling
+thread but the compression of the JSON documents is done in a pool of threads
+(`zlib` releases the GIL while compressing). The compressed members are then
+appended to the zip file in the order in which they were written, so that
+the package has the same layout as a package that is written sequentially.
+The compression level can be selected; with level 0 the members are stored
+without compression which is the fastest option for local pipelines.
+"""
+
+import collections
+import concurrent.futures
+import json
+import logging as log
+import struct
+import time
+import zlib
+
+import olca
+
+from typing import Optional
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_ZIP64_END_RECORD = struct.Struct("<IQHHIIQQQQ")
+_ZIP64_LOCATOR = struct.Struct("<IIQI")
+
+# entity type -> folder in the package; the same as in `olca.pack.Writer`
+_FOLDERS = {
+    olca.Category: "categories",
+    olca.Process: "processes",
+    olca.Flow: "flows",
+    olca.FlowProperty: "flow_properties",
+    olca.Actor: "actors",
+    olca.ImpactCategory: "lcia_categories",
+    olca.ImpactMethod: "lcia_methods",
+    olca.Location: "locations",
+    olca.Parameter: "parameters",
+    olca.ProductSystem: "product_systems",
+    olca.SocialIndicator: "social_indicators",
+    olca.Source: "sources",
+    olca.Unit: "units",
+    olca.UnitGroup: "unit_groups",
+}
+
+_STORED = 0
+_DEFLATED = 8
+_UTF8_FLAG = 0x800
+# the "version made by" of the central directory: Unix (3) as host system as
+# the external attributes contain Unix file permissions
+_UNIX_HOST = 3 << 8
+# a regular file with rw-r--r-- permissions
+_FILE_MODE = 0o100644
+_MAX_16 = 0xFFFF
+_MAX_32 = 0xFFFFFFFF
+
+
+class Writer(object):
+
+    def __init__(self, fpath: str, threads=1, level=zlib.Z_DEFAULT_COMPRESSION):
+        self.threads = threads
+        self.level = level
+        self.method = _STORED if level == 0 else _DEFLATED
+        self._file = open(fpath, "wb")
+        self._offset = 0
+        # the (name, crc, compressed size, size, offset) of written members
+        self._members = []
+        # (name, size, future) of the members that are compressed
+        self._pending = collections.deque()
+        self._pool = None  # type: Optional[concurrent.futures.Executor]
+        if threads > 1:
+            self._pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=threads)
+        t = time.localtime()
+        self._dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+        self._dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def write(self, entity: olca.Entity):
+        if not isinstance(entity, olca.Entity):
+            log.error('%s is not an instance of Entity; skipped it', entity)
+            return
+        folder = _folder(entity)
+        if folder is None:
+            folder = "unknown"
+        self.write_json(entity.to_json(), folder)
+
+    def write_json(self, obj: dict, folder: str):
+        uid = obj.get("@id")
+        if uid is None or uid == "":
+            log.error("No @id for object %s in %s", obj, folder)
+            return
+        path = "%s/%s.json" % (folder, uid)
+        self.write_bytes(path, json.dumps(obj).encode("utf-8"))
+
+    def write_bytes(self, path: str, data: bytes):
+        """ Adds the given data as member with the given path to the package.
+            The data are compressed in the thread pool if there is one. """
+        if self._pool is None:
+            self._append(path, len(data), _compress(data, self.level))
+            return
+        future = self._pool.submit(_compress, data, self.level)
+        self._pending.append((path, len(data), future))
+        # limit the number of documents that are held in memory
+        while len(self._pending) > 4 * self.threads:
+            self._flush_one()
+
+    def close(self):
+        if self._file is None:
+            return
+        while len(self._pending) > 0:
+            self._flush_one()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self._write_central_directory()
+        self._file.close()
+        self._file = None
+
+    def _flush_one(self):
+        path, size, future = self._pending.popleft()
+        self._append(path, size, future.result())
+
+    def _append(self, path: str, size: int, compressed: tuple):
+        crc, data = compressed
+        name = path.encode("utf-8")
+        header = _LOCAL_HEADER.pack(
+            0x04034b50, 20, _UTF8_FLAG, self.method,
+            self._dos_time, self._dos_date, crc, len(data), size, len(name), 0)
+        self._file.write(header)
+        self._file.write(name)
+        self._file.write(data)
+        self._members.append((name, crc, len(data), size, self._offset))
+        self._offset += len(header) + len(name) + len(data)
+
+    def _write_central_directory(self):
+        start = self._offset
+        for name, crc, csize, size, offset in self._members:
+            extra = b""
+            version = 20
+            if offset >= _MAX_32:
+                extra = struct.pack("<HHQ", 0x0001, 8, offset)
+                offset = _MAX_32
+                version = 45
+            header = _CENTRAL_HEADER.pack(
+                0x02014b50, _UNIX_HOST | version, version, _UTF8_FLAG,
+                self.method, self._dos_time, self._dos_date, crc, csize,
+                size, len(name), len(extra), 0, 0, 0, _FILE_MODE << 16, offset)
+            self._file.write(header)
+            self._file.write(name)
+            self._file.write(extra)
+            self._offset += len(header) + len(name) + len(extra)
+        size = self._offset - start
+        count = len(self._members)
+
+        if count >= _MAX_16 or size >= _MAX_32 or start >= _MAX_32:
+            zip64_offset = self._offset
+            self._file.write(_ZIP64_END_RECORD.pack(
+                0x06064b50, 44, 45, 45, 0, 0, count, count, size, start))
+            self._file.write(_ZIP64_LOCATOR.pack(
+                0x07064b50, 0, zip64_offset, 1))
+        self._file.write(_END_RECORD.pack(
+            0x06054b50, 0, 0, min(count, _MAX_16), min(count, _MAX_16),
+            min(size, _MAX_32), min(start, _MAX_32), 0))
+
+
+def _compress(data: bytes, level: int) -> tuple:
+    """ Returns the CRC-32 checksum and the compressed data (raw deflate) of
+        the given data; with level 0 the data are returned unchanged. """
+    crc = zlib.crc32(data)
+    if level == 0:
+        return crc, data
+    c = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return crc, c.compress(data) + c.flush()
+
+
+def _folder(entity: olca.Entity) -> Optional[str]:
+    """ Returns the folder of the given entity in the package; it is the same
+        as in `olca.pack.Writer`. """
+    folder = _FOLDERS.get(type(entity))
+    if folder is None:
+        log.warning("unknown entity type %s", type(entity))
+    return folder
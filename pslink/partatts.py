@@ -3,9 +3,12 @@ This module containts functions for extracting attributes of component parts.
 """
 
 import logging
+import re
 
 import pslink.quant as quant
 
+from typing import Optional
+
 
 def from_file(fpath: str, encoding="utf-8") -> dict:
     """ Read the attributes of a component part from the given file. We
@@ -24,46 +27,126 @@ def from_file(fpath: str, encoding="utf-8") -> dict:
     return atts
 
 
+# the attributes that contain material names
+_MATERIAL_ATTS = frozenset([
+    "material", "iii material", "body material", "stem material",
+    "seat material", "flow control device material", "spring material",
+    "screw material"])
+
+# the default suffixes that are removed from material names
+SUFFIXES = ("overall", "inner layer", "outer race member")
+
+
+class MaterialResolver(object):
+    """ Resolves material names to the materials of a density table. The
+        names are normalized (lower case, single spaces, and without known
+        suffixes) and can be mapped to a material via aliases. The
+        resolutions are cached so that repeated material names cost a single
+        dictionary lookup. """
+
+    def __init__(self, densities: dict, aliases: dict = None,
+                 suffixes=SUFFIXES):
+        self.suffixes = tuple(suffixes)
+        # a single pattern that matches the first of the suffixes at the end
+        # of a name; the suffixes are tried in the given order
+        self._suffix_pattern = None
+        if len(self.suffixes) > 0:
+            self._suffix_pattern = re.compile("(?:%s)$" % "|".join(
+                re.escape(s) for s in self.suffixes))
+        # normalized material -> (material, density)
+        self.densities = {}
+        for mat, dens in densities.items():
+            self.densities[_normalize(mat)] = (mat, dens)
+        # normalized alias -> normalized material
+        self.aliases = {}
+        if aliases is not None:
+            for alias, mat in aliases.items():
+                self.aliases[_normalize(alias)] = self.normalize(mat)
+        # the cached resolutions: name -> material or `None`
+        self._resolved = {}
+
+    def normalize(self, name: str) -> str:
+        """ Converts the given name into lower case, removes the first
+            matching suffix, and collapses the whitespace. """
+        mat = name.strip().lower()
+        if self._suffix_pattern is not None:
+            m = self._suffix_pattern.search(mat)
+            if m is not None:
+                mat = mat[0:m.start()]
+        return _normalize(mat)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """ Returns the material of the density table for the given name or
+            `None` if there is no such material. """
+        try:
+            return self._resolved[name]
+        except KeyError:
+            pass
+        mat = self.normalize(name)
+        mat = self.aliases.get(mat, mat)
+        entry = self.densities.get(mat)
+        resolved = None if entry is None else entry[0]
+        self._resolved[name] = resolved
+        return resolved
+
+    def density(self, material: str) -> float:
+        """ Returns the density of a material that was returned from
+            `resolve`. """
+        return float(self.densities[_normalize(material)][1])
+
+    def materials(self, atts: dict) -> set:
+        """ Returns the normalized material names from the given
+            attributes. """
+        s = set()
+        for k, v in atts.items():
+            if not k.strip().lower() in _MATERIAL_ATTS:
+                continue
+            for m in v.split(" or "):
+                s.add(self.normalize(m))
+        return s
+
+
+def _normalize(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+# a resolver without densities for extracting the material names; it is only
+# used for normalizing names and thus holds no cached resolutions
+_NAMES = MaterialResolver({})
+
+
 def materials(atts: dict) -> set:
     """ Returns a list of material names from the given attributes. """
-    mat_atts = {"material", "iii material", "body material", "stem material",
-                "seat material", "flow control device material",
-                "spring material", "screw material"}
-    suffixes = ["overall", "inner layer", "outer race member"]
-    s = set()
-    for k, v in atts.items():
-        if not k.strip().lower() in mat_atts:
-            continue
-        mats = v.split(" or ")
-        for m in mats:
-            mat = m.strip().lower()  # type: str
-            for suffix in suffixes:
-                if mat.endswith(suffix):
-                    mat = mat[0:len(mat) - len(suffix)].strip()
-                    break
-            s.add(mat)
-    return s
-
-
-def material_inputs(atts: dict, densities: dict) -> list:
+    return _NAMES.materials(atts)
+
+
+def material_inputs(atts: dict, densities) -> list:
     """ Calculates the material inputs from the given attributes and material
-        densities. It returns a list of tuples with the respective material
-        names and masses in kilogram. """
+        densities. The densities can be a `MaterialResolver` or a map
+        material->density. For a map, a new resolver is created in each call;
+        callers that calculate the inputs of many components should create a
+        resolver once and pass it in (like `InputCache`). It returns a list of
+        tuples with the respective material names and masses in kilogram. """
+    resolver = densities
+    if not isinstance(resolver, MaterialResolver):
+        resolver = MaterialResolver(densities)
     vol_cm3 = quant.volume_cm3(atts)
     if vol_cm3 == 0:
         return []
     mats = []
-    for mat in materials(atts):
-        if mat not in densities:
-            logging.warning("no density for material %s given", mat)
+    for name in resolver.materials(atts):
+        mat = resolver.resolve(name)
+        if mat is None:
+            logging.warning("no density for material %s given", name)
             continue
-        mats.append(mat)
+        if mat not in mats:
+            mats.append(mat)
     if len(mats) == 0:
         logging.warning("no materials with densities found in %s", atts)
         return []
     vol = vol_cm3 / len(mats)
     inputs = []
     for mat in mats:
-        grams = float(vol * float(densities[mat]))
+        grams = float(vol * resolver.density(mat))
         inputs.append((mat, grams / 1000.0))
     return inputs
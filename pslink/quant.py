@@ -1,92 +1,222 @@
 # estimating material quantities of a component from attribute-value pairs
 
+import functools
 import logging
 import re
 
+import numpy
 import sympy
 
 
 class VolumeFormula(object):
 
+    # the registered formulas in the order of their priority
     _formulas = []
 
+    # an index attribute->formula positions: each formula is indexed by its
+    # attribute that is the rarest in all registered formulas; it is built
+    # lazily and reset when a new formula is registered
+    _index = None
+
     def __init__(self, attributes: dict, formula: str):
         self.attributes = {}
         for k, v in attributes.items():
             self.attributes[k.strip().lower()] = v.strip()
         self.formula = formula
 
+        # compile the formula into numeric functions; the parameters of
+        # these functions are the symbols of the formula in sorted order
+        expr = sympy.sympify(formula)
+        self._symbols = sorted(str(sym) for sym in expr.free_symbols)
+        unbound = set(self._symbols) - set(self.attributes.values())
+        if len(unbound) > 0:
+            raise ValueError("unbound symbols %s in formula %s" % (
+                unbound, formula))
+        params = [sympy.Symbol(sym) for sym in self._symbols]
+        self._fn = sympy.lambdify(params, expr, modules="math")
+        self._np_fn = sympy.lambdify(params, expr, modules="numpy")
+
     def matches(self, bindings: dict) -> bool:
         if not isinstance(bindings, dict):
             return False
-        keys = set([k.strip().lower() for k in bindings.keys()])
+        return self._matches_keys(_normalize_keys(bindings))
+
+    def _matches_keys(self, keys: set) -> bool:
+        """ Same as `matches` but with the already normalized binding keys. """
         for k in self.attributes.keys():
             if k not in keys:
                 return False
         return True
 
-    def get_cm3(self, bindings: dict) -> float:
-        expr = sympy.sympify(self.formula)
+    def _lengths(self, bindings: dict) -> dict:
+        """ Returns a map symbol->length in cm for the given bindings. """
+        lengths = {}
         for k, v in bindings.items():
             k = k.strip().lower()
             if k not in self.attributes:
                 continue
-            length = length_cm(v)
             symbol = self.attributes[k]
-            expr = expr.subs(symbol, length)
-        return expr.evalf()
+            # the first binding of a symbol wins
+            if symbol not in lengths:
+                lengths[symbol] = length_cm(v)
+        return lengths
+
+    def get_cm3(self, bindings: dict) -> float:
+        lengths = self._lengths(bindings)
+        return float(self._fn(*[lengths[sym] for sym in self._symbols]))
+
+    def get_cm3_batch(self, bindings: list) -> numpy.ndarray:
+        """ Calculates the volumes for a list of bindings at once. It returns
+            an array with the respective volumes in cm3. All bindings need to
+            match this formula. """
+        lengths = [self._lengths(b) for b in bindings]
+        args = [numpy.fromiter((ls[sym] for ls in lengths), dtype=float,
+                               count=len(lengths))
+                for sym in self._symbols]
+        vols = self._np_fn(*args)
+        # a formula without symbols returns a scalar
+        return numpy.broadcast_to(
+            numpy.asarray(vols, dtype=float), (len(lengths),)).copy()
 
     @staticmethod
     def register(attributes: dict, formula: str):
         VolumeFormula._formulas.append(VolumeFormula(attributes, formula))
+        VolumeFormula._index = None
+
+    @staticmethod
+    def find(bindings: dict):
+        """ Returns the first registered formula that matches the given
+            bindings or `None` if there is no such formula. """
+        if not isinstance(bindings, dict):
+            return None
+        index = VolumeFormula._index
+        if index is None:
+            index = VolumeFormula._build_index()
+        keys = _normalize_keys(bindings)
+        # formulas without attributes are stored under the `None` key
+        candidates = list(index.get(None, []))
+        for k in keys:
+            positions = index.get(k)
+            if positions is not None:
+                candidates.extend(positions)
+        candidates.sort()
+        for pos in candidates:
+            f = VolumeFormula._formulas[pos]  # type: VolumeFormula
+            if f._matches_keys(keys):
+                return f
+        return None
+
+    @staticmethod
+    def _build_index() -> dict:
+        counts = {}
+        for f in VolumeFormula._formulas:
+            for k in f.attributes.keys():
+                counts[k] = counts.get(k, 0) + 1
+        index = {}
+        for pos, f in enumerate(VolumeFormula._formulas):
+            if len(f.attributes) == 0:
+                index.setdefault(None, []).append(pos)
+                continue
+            rarest = min(f.attributes.keys(), key=lambda k: (counts[k], k))
+            index.setdefault(rarest, []).append(pos)
+        VolumeFormula._index = index
+        return index
+
+
+def _normalize_keys(bindings: dict) -> set:
+    return set([k.strip().lower() for k in bindings.keys()])
 
 
 def volume_cm3(bindings: dict) -> float:
-    for f in VolumeFormula._formulas:
-        if f.matches(bindings):
-            return f.get_cm3(bindings)
+    f = VolumeFormula.find(bindings)
+    if f is not None:
+        return f.get_cm3(bindings)
     logging.error("Could not find a volume formula for %s", bindings)
     return 0
 
 
+# the length units with their factors for converting them into centimetres
+# and their priority when a text contains multiple lengths (lower values are
+# preferred)
+_UNITS = {
+    "inches": (2.54, 1), "inch": (2.54, 1), "in": (2.54, 1),
+    "feet": (30.48, 2), "foot": (30.48, 2), "ft": (30.48, 2),
+    "millimeters": (0.1, 3), "millimetres": (0.1, 3), "mm": (0.1, 3),
+    "centimeters": (1.0, 3), "centimetres": (1.0, 3), "cm": (1.0, 3),
+    "meters": (100.0, 3), "metres": (100.0, 3), "m": (100.0, 3),
+}
+
+# a number like `42`, `0.25`, `1/4`, `1-1/4`, or `1 1/4`
+_NUM = r"(?:\d+[- ]\d+/\d+|\d+/\d+|[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:e[-+]?\d+)?)"
+
+# the units, longest first so that `mm` is not matched as `m`
+_UNIT = "(?:%s)(?![a-z])" % "|".join(
+    sorted(_UNITS.keys(), key=lambda u: -len(u)))
+
+_LENGTH_PATTERN = re.compile(r"""
+    (?<!\S)(?P<min>{num})\s*(?P<min_unit>{unit})\s+minimum\s+and\s+
+        (?P<max>{num})\s*(?P<max_unit>{unit})\s+maximum
+  | (?<!\S)(?P<value>{num})\s*(?P<unit>{unit})
+""".format(num=_NUM, unit=_UNIT), re.IGNORECASE | re.VERBOSE)
+
+
+def _number(s: str) -> float:
+    s = s.strip()
+    if "/" not in s:
+        return float(s)
+    whole = 0.0
+    for sep in ("-", " "):
+        if sep in s:
+            w, s = s.split(sep, 1)
+            whole = float(w)
+            break
+    num, den = s.split("/")
+    return whole + float(num) / float(den)
+
+
 def length_cm(s: str) -> float:
     """ Extracts the length from the given string and returns it in centimetres.
-        Currently only texts in the form `<number> inches` are supported. """
+        Supported are texts in the form `<number> <unit>` where the unit can
+        be inches, feet, mm, cm, or m and the number can be also a fraction
+        like `1/4` or `1-1/4`. For ranges like `21.21 inches minimum and 42.42
+        inches maximum` the mean value is returned. If a text
+        contains multiple lengths, ranges are preferred, then inches, then
+        feet, and then the metric units. """
     if not isinstance(s, str):
         return 0.0
+    return _parse_length(s)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_length(s: str) -> float:
+    best = None
+    best_rank = None
+    for match in _LENGTH_PATTERN.finditer(s):
+        if match.group("min") is not None:
+            rank = 0
+        else:
+            rank = _UNITS[match.group("unit").lower()][1]
+        if best is None or rank < best_rank:
+            best = match
+            best_rank = rank
+    if best is None:
+        logging.warning("no matching pattern to extract length from: %s", s)
+        return 0.0
+
+    try:
+        if best.group("min") is not None:
+            return _mean_cm(best.group("min"), best.group("min_unit"),
+                            best.group("max"), best.group("max_unit"))
+        factor = _UNITS[best.group("unit").lower()][0]
+        return _number(best.group("value")) * factor
+    except (ValueError, ZeroDivisionError):
+        logging.error("failed to parse length in: %s", s)
+        return 0.0
+
 
-    # a range
-    regex = r"([^\s]*) inches minimum and ([^\s]*) inches maximum"
-    match = re.search(regex, s)
-    if match is not None:
-        try:
-            mini = float(match.group(1))
-            maxi = float(match.group(2))
-            return 2.54 * (mini + maxi) / 2
-        except ValueError:
-            logging.error("failed to parse inches in: %s", s)
-            return 0.0
-
-    # single value
-    regex = r"([^\s]*) inches"
-    match = re.search(regex, s)
-    if match is not None:
-        try:
-            inches = match.group(1)
-            return float(inches) * 2.54
-        except ValueError:
-            logging.error("failed to parse inches in: %s", s)
-            return 0.0
-
-    regex = r"([^\s]*) feet"
-    match = re.search(regex, s)
-    if match is not None:
-        try:
-            feet = match.group(1)
-            return float(feet) * 30.48
-        except ValueError:
-            logging.error("failed to parse feet in: %s", s)
-            return 0.0
-
-    logging.error("no mathing pattern to extract length from: %s", s)
-    return 0.0
+def _mean_cm(a: str, unit_a: str, b: str, unit_b: str) -> float:
+    factor_a = _UNITS[unit_a.lower()][0]
+    factor_b = _UNITS[unit_b.lower()][0]
+    if factor_a == factor_b:
+        return factor_a * (_number(a) + _number(b)) / 2
+    return (factor_a * _number(a) + factor_b * _number(b)) / 2
@@ -1,4 +1,16 @@
+import concurrent.futures
+import dataclasses
+import gzip
+import heapq
+import math
+import mmap
+import re
+import struct
+
 from enum import Enum
+from typing import Optional
+
+import numpy
 
 import pslink.symap as symap
 import pslink.backs as backs
@@ -26,6 +38,8 @@ class RelationType(Enum):
 class Relation(object):
     """ A directed relation from a source node to a target node. """
 
+    __slots__ = ("source", "target", "rtype")
+
     def __init__(self, source: str, target: str, rtype: RelationType):
         self.source = source
         self.target = target
@@ -55,6 +69,12 @@ class Relation(object):
         return '"%s" , "%s"?' % (self.source, self.target)
 
 
+# matcher functions that can only return a score > 0 when the compared
+# phrases share at least one keyword; for these we can use the keyword index
+# of the graph to select the candidate nodes
+_KEYWORD_MATCHERS = (symap.words_equality, symap.compare_with_lci_name)
+
+
 class Graph(object):
     """ A simple graph model for searching semantic relations between products. """
 
@@ -62,6 +82,14 @@ class Graph(object):
         self.nodes = set()
         self.edges = {}
 
+        # the (source, target) pairs of all relations in `edges` for fast
+        # duplicate checks
+        self._links = set()
+
+        # an inverted index keyword->node* that contains for a keyword the
+        # nodes with that keyword in their label
+        self._keyword_index = {}
+
         # a map node->ProductInfo* that contains for a node
         # a list of linked products
         self._product_infos = {}
@@ -70,6 +98,15 @@ class Graph(object):
         # the (maximum) syntax factor for these products
         self._syn_factors = {}
 
+        # cached closures of the same-as and broader relations; they are
+        # calculated on demand and reset when a relation is added:
+        # node->frozenset of the nodes in the same-as class of that node
+        self._same_classes = None  # type: Optional[dict]
+        # same-as class->frozenset of the direct broader nodes of that class
+        self._class_broader = {}
+        # same-as class->{node->level} of all broader nodes of that class
+        self._class_levels = {}
+
     def add_relation(self, rel: Relation):
         """ Add the given relation to this graph. If the relation is a same-as,
             broader, or narrower relation it will also add the inverse of that
@@ -78,18 +115,23 @@ class Graph(object):
         if rel.source is None or rel.target is None or rel.rtype is None:
             return
 
-        self.nodes.add(rel.source)
-        self.nodes.add(rel.target)
+        if rel.source not in self.nodes:
+            self._add_node(rel.source)
+        if rel.target not in self.nodes:
+            self._add_node(rel.target)
+
         rels = self.edges.get(rel.source)
         if rels is None:
             rels = []
             self.edges[rel.source] = rels
 
         # skip if it is a duplicate
-        for r in rels:  # type: Relation
-            if r.target == rel.target:
-                return
+        key = (rel.source, rel.target)
+        if key in self._links:
+            return
         rels.append(rel)
+        self._links.add(key)
+        self._reset_closures()
 
         # add the inverse relation
         if rel.rtype != RelationType.derived:
@@ -106,6 +148,33 @@ class Graph(object):
             elif rel.rtype == RelationType.narrower:
                 trels.append(Relation(
                     rel.target, rel.source, RelationType.broader))
+            self._links.add((rel.target, rel.source))
+
+    def _add_node(self, node: str):
+        """ Adds the given node to this graph and registers it in the keyword
+            index. """
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        # note that we index the keywords with the stopwords that are known
+        # at this point; as stopwords can be only added later, the keywords
+        # of a node can just get less so that the index is never too small
+        for keyword in symap.keywords(node):
+            nodes = self._keyword_index.get(keyword)
+            if nodes is None:
+                nodes = set()
+                self._keyword_index[keyword] = nodes
+            nodes.add(node)
+
+    def candidate_nodes(self, name: str) -> set:
+        """ Returns the nodes that have at least one keyword in common with the
+            given name. """
+        candidates = set()
+        for keyword in symap.keywords(name):
+            nodes = self._keyword_index.get(keyword)
+            if nodes is not None:
+                candidates.update(nodes)
+        return candidates
 
     def relations_of(self, source_node: str) -> list:
         """ Get all direct relations where the given node is the source node.
@@ -119,76 +188,128 @@ class Graph(object):
             from the nodes that have a `same as` relation with the given node
             (it is a transitive search).
         """
-        broader = set()
-        handled = set()
-        queue = [node]
-        while len(queue) > 0:
-            n = queue.pop()
-            handled.add(n)
-            for rel in self.relations_of(n):  # type: Relation
-                if rel.rtype == RelationType.broader:
-                    broader.add(rel.target)
-                elif rel.rtype == RelationType.same:
-                    nn = rel.target
-                    if nn not in handled and nn not in queue:
-                        queue.append(nn)
-        return broader
+        return set(self._broader_of_class(self._same_class(node)))
 
     def same_of(self, node) -> set:
         """ Get a list of all nodes that are transitively in a `same-as`
             relation to the given node including the node itself. """
-        nodes = set()
-        queue = [node]
-        while len(queue) > 0:
-            n = queue.pop()
-            nodes.add(n)
-            for rel in self.relations_of(n):  # type: Relation
-                if rel.rtype == RelationType.same:
-                    nn = rel.target
-                    if nn not in nodes and nn not in queue:
-                        queue.append(nn)
-        return nodes
+        return set(self._same_class(node))
 
     def closest_broader(self, a: str, b: str) -> tuple:
+        """ Returns the closest common broader node of the given nodes as
+            tuple `(node, level_a, level_b)` where the levels are the number
+            of broader steps from the respective node to the common node; the
+            nodes in a same-as relation have the same level. Of the common
+            nodes the one with the smallest maximum level is taken, where the
+            given nodes are preferred over their same-as nodes. It returns an
+            empty tuple if the nodes have no common broader node. """
+        levels_a = self._broader_levels(a)
+        levels_b = self._broader_levels(b)
+        common = levels_a.keys() & levels_b.keys()
+        if len(common) == 0:
+            return ()
+        node = min(common, key=lambda n: (max(levels_a[n], levels_b[n]),
+                                          levels_a[n], levels_b[n],
+                                          n != a and n != b, n))
+        return node, levels_a[node], levels_b[node]
 
-        nodes_a = [(n, 0) for n in self.same_of(a)]
-        nodes_b = [(n, 0) for n in self.same_of(b)]
+    def _reset_closures(self):
+        """ Resets the cached closures of the same-as and broader relations;
+            this is called when the relations of the graph are modified. """
+        self._same_classes = None
+        self._class_broader = {}
+        self._class_levels = {}
 
-        if len(nodes_a) == 0 or len(nodes_b) == 0:
-            return ()
+    def _same_class(self, node: str) -> frozenset:
+        """ Returns the same-as class of the given node. """
+        if self._same_classes is None:
+            self._same_classes = self._build_same_classes()
+        c = self._same_classes.get(node)
+        return c if c is not None else frozenset((node,))
 
-        level = 0
-        while True:
+    def _build_same_classes(self) -> dict:
+        """ Calculates the same-as classes of the nodes in this graph with a
+            union-find over the same-as relations. Nodes without a same-as
+            relation are not contained in the returned map. """
+        parents = {}
+
+        def find(n):
+            root = n
+            while True:
+                p = parents.get(root, root)
+                if p == root:
+                    break
+                root = p
+            while n != root:
+                parents[n], n = root, parents[n]
+            return root
+
+        for rels in self.edges.values():
+            for rel in rels:  # type: Relation
+                if rel.rtype != RelationType.same:
+                    continue
+                ra = find(rel.source)
+                rb = find(rel.target)
+                if ra != rb:
+                    parents[ra] = rb
 
-            na = None
-            nb = None
+        members = {}
+        for n in parents:
+            root = find(n)
+            m = members.get(root)
+            if m is None:
+                m = [root]
+                members[root] = m
+            if n != root:
+                m.append(n)
+        classes = {}
+        for m in members.values():
+            c = frozenset(m)
+            for n in m:
+                classes[n] = c
+        return classes
 
-            for node_a in nodes_a:
-                if na is None and node_a[1] == level:
-                    na = node_a[0]
-                for node_b in nodes_b:
-                    if nb is None and node_b[1] == level:
-                        nb = node_b[0]
-                    if node_a[0] == node_b[0]:
-                        return node_a[0], node_a[1], node_b[1]
+    def _broader_of_class(self, c: frozenset) -> frozenset:
+        """ Returns the direct broader nodes of the nodes in the given same-as
+            class. """
+        broader = self._class_broader.get(c)
+        if broader is not None:
+            return broader
+        targets = set()
+        for n in c:
+            for rel in self.relations_of(n):  # type: Relation
+                if rel.rtype == RelationType.broader:
+                    targets.add(rel.target)
+        broader = frozenset(targets)
+        self._class_broader[c] = broader
+        return broader
 
-            # no match found: fetch the next level
+    def _broader_levels(self, node: str) -> dict:
+        """ Returns a map node->level with all nodes that are transitively
+            broader than the given node, including the node itself and its
+            same-as nodes with level 0. """
+        c = self._same_class(node)
+        levels = self._class_levels.get(c)
+        if levels is not None:
+            return levels
+        levels = {}
+        visited = {c}
+        current = [c]
+        level = 0
+        while len(current) > 0:
+            following = []
+            for cc in current:
+                for n in cc:
+                    levels[n] = level
+                for b in self._broader_of_class(cc):
+                    bc = self._same_class(b)
+                    if bc not in visited:
+                        visited.add(bc)
+                        following.append(bc)
+            current = following
             level += 1
-            has_more = False
-            if na is not None:
-                broader_a = self.broader_of(na)
-                if len(broader_a) > 0:
-                    has_more = True
-                    nodes_a.extend([(b, level) for b in broader_a])
-            if nb is not None:
-                broader_b = self.broader_of(nb)
-                if len(broader_b) > 0:
-                    has_more = True
-                    nodes_b.extend([(b, level) for b in broader_b])
-
-            if not has_more:
-                break
-        return ()
+        self._class_levels[c] = levels
+        return levels
 
     def find_nodes(self, name: str, matcher) -> list:
         """Find all nodes for the given name and matcher function with a
@@ -197,9 +318,15 @@ class Graph(object):
            function. This function call should return a score between 0 and 1.
            We return a list of tuples (score:float, node:str) for nodes with
            a score > 0. If there is no node with score > 0 in the graph we
-           return an empty list."""
+           return an empty list. For keyword based matchers (like
+           `symap.words_equality`) only the nodes that share a keyword with
+           the given name are scored."""
+        if matcher in _KEYWORD_MATCHERS:
+            nodes = self.candidate_nodes(name)
+        else:
+            nodes = self.nodes
         matches = []
-        for node in self.nodes:
+        for node in nodes:
             score = matcher(node, name)
             if not isinstance(score, (int, float)):
                 continue
@@ -207,36 +334,47 @@ class Graph(object):
                 matches.append((score, node))
         return matches
 
-    def link_products(self, infos: list, matcher=symap.compare_with_lci_name):
+    def link_products(self, infos: list, matcher=symap.compare_with_lci_name,
+                      workers=1):
         """ Links a list with product information (see ProductInfo) to the
             nodes in this graph using a syntactical matcher function. When
             multiple products map to the same node only the nodes with the
-            highest scores are added to the graph. """
-
-        for node in self.nodes:
-            products = []
-            syn_factor = 0.0
-            for info in infos:  # type: backs.ProductInfo
-                score = matcher(node, info.product_name)
-                if score < 1e-6:
-                    continue
-                if abs(score - syn_factor) < 1e-6:
-                    # we have an equal score
-                    products.append(info)
-                    continue
-                if score < syn_factor:
-                    # there are already better matching products
-                    # assigned to that node
-                    continue
-                if score > syn_factor:
-                    # the new product has a better score
-                    syn_factor = score
-                    products = [info]
-                    continue
+            highest scores are added to the graph. For the default matcher
+            `symap.compare_with_lci_name` the product names are indexed so
+            that only the products that share a keyword with a node are
+            compared with that node. With `workers > 1` the nodes are linked
+            in a pool of the given number of processes; the matcher then needs
+            to be a picklable (module level) function. """
 
-            if len(products) > 0:
-                self._product_infos[node] = products
-                self._syn_factors[node] = syn_factor
+        names = [info.product_name for info in infos]
+        if matcher is symap.compare_with_lci_name:
+            index = symap.LciNameIndex(names)
+        else:
+            index = None
+
+        nodes = list(self.nodes)
+        if workers is None or workers <= 1 or len(nodes) < 2:
+            results = _link_nodes(nodes, names, matcher, index)
+        else:
+            # the matcher and product table are passed only once into each
+            # worker via the initializer; the tasks just contain the nodes
+            chunk_size = max(1, math.ceil(len(nodes) / (4 * workers)))
+            chunks = [nodes[i:i + chunk_size]
+                      for i in range(0, len(nodes), chunk_size)]
+            results = []
+            initargs = (names, matcher, index, symap.stopwords())
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_link_worker,
+                    initargs=initargs) as pool:
+                # map returns the results in the order of the chunks, so we
+                # fill the maps in the same order as in a serial run
+                for chunk_results in pool.map(_link_worker_task, chunks):
+                    results.extend(chunk_results)
+
+        for node, positions, syn_factor in results:
+            self._product_infos[node] = [infos[pos] for pos in positions]
+            self._syn_factors[node] = syn_factor
 
     def find_products(self, name) -> list:
         """Searches the graph for matching products for the given name. It
@@ -246,6 +384,11 @@ class Graph(object):
         matches = self.find_nodes(name, symap.words_equality)
         if len(matches) == 0:
             return []
+        return _select_max_products(self._collect_products(matches))
+
+    def _collect_products(self, matches: list) -> list:
+        """ Traverses the graph from the given matching nodes and returns the
+            reached products as list of tuples (score, product info). """
 
         # a queue of tuples: (relation_factor, node) of the
         # nodes that still need to be visited
@@ -283,31 +426,29 @@ class Graph(object):
                         queue.append((next_factor, target))
                         scores[target] = next_factor
 
-        if len(products) == 0:
-            return []
+        return products
 
-        max_score = 0.0
-        for p in products:
-            if p[0] > max_score:
-                max_score = p[0]
-
-        # select the final product list
-        # avoiding duplicate product-process pairs
-        selected = []
-        selected_keys = set()
-        for p in products:
-            score = p[0]
-            if abs(score - max_score) > 1e-3:
+    def find_products_many(self, names: list) -> dict:
+        """ Searches the graph for matching products for each of the given
+            names and returns a dictionary name->products. The products of a
+            name are the same and in the same order as the products of
+            `find_products`, but they are copies with the score for that name.
+            Names that match the same nodes with the same scores (e.g. names
+            that only differ in case or stopwords) share one traversal. """
+        traversals = {}
+        results = {}
+        for name in dict.fromkeys(names):
+            matches = self.find_nodes(name, symap.words_equality)
+            if len(matches) == 0:
+                results[name] = []
                 continue
-            info = p[1]  # type: backs.ProductInfo
-            pkey = info.process_uuid + "#" + info.product_uuid
-            if pkey in selected_keys:
-                continue
-            selected_keys.add(pkey)
-            info.score = score
-            selected.append(info)
-
-        return selected
+            key = tuple(matches)
+            products = traversals.get(key)
+            if products is None:
+                products = self._collect_products(matches)
+                traversals[key] = products
+            results[name] = _select_max_products(products, copy=True)
+        return results
 
     def explain(self, name, matcher=symap.words_equality, max_level=-1):
         """Prints the traversal tree with mapping scores for a product with the
@@ -349,76 +490,209 @@ class Graph(object):
             explain_rec(m, init_scores, 1)
 
 
+# the state of a worker process when linking products in a process pool:
+# a tuple (product names, matcher, index)
+_link_worker_state = None
+
+
+def _init_link_worker(names: list, matcher, index, stopwords):
+    global _link_worker_state
+    _link_worker_state = (names, matcher, index)
+    # a spawned worker does not know the stopwords that were added in the
+    # main process
+    for w in stopwords:
+        if not symap.is_stopword(w):
+            symap.add_stopword(w)
+
+
+def _link_worker_task(nodes: list) -> list:
+    names, matcher, index = _link_worker_state
+    return _link_nodes(nodes, names, matcher, index)
+
+
+def _link_nodes(nodes: list, names: list, matcher, index) -> list:
+    """ Links the given nodes with the product names. It returns a list of
+        tuples (node, product positions, syntax factor) for the nodes with
+        linked products. If an index of the product names is given, it is used
+        instead of the matcher. """
+    results = []
+    for node in nodes:
+        if index is not None:
+            scores = index.compare(node)
+        else:
+            scores = [(pos, matcher(node, name))
+                      for pos, name in enumerate(names)]
+        positions, syn_factor = _select_products(scores)
+        if len(positions) > 0:
+            results.append((node, positions, syn_factor))
+    return results
+
+
+def _select_max_products(products: list, copy=False) -> list:
+    """ Selects the products with the maximum score (with a tolerance of 1e-3)
+        from the given list of (score, ProductInfo) tuples avoiding duplicate
+        product-process pairs. The score is set on the selected products or,
+        with `copy=True`, on copies of them. """
+    if len(products) == 0:
+        return []
+
+    max_score = 0.0
+    for p in products:
+        if p[0] > max_score:
+            max_score = p[0]
+
+    # select the final product list
+    # avoiding duplicate product-process pairs
+    selected = []
+    selected_keys = set()
+    for p in products:
+        score = p[0]
+        if abs(score - max_score) > 1e-3:
+            continue
+        info = p[1]  # type: backs.ProductInfo
+        pkey = info.process_uuid + "#" + info.product_uuid
+        if pkey in selected_keys:
+            continue
+        selected_keys.add(pkey)
+        if copy:
+            info = dataclasses.replace(info)
+        info.score = score
+        selected.append(info)
+
+    return selected
+
+
+def _select_products(scores: list) -> tuple:
+    """ Selects the products with the highest score from the given list of
+        (product, score) tuples. It returns a tuple with the list of the
+        selected products and their score (the syntax factor). """
+    products = []
+    syn_factor = 0.0
+    for product, score in scores:
+        if score < 1e-6:
+            continue
+        if abs(score - syn_factor) < 1e-6:
+            # we have an equal score
+            products.append(product)
+            continue
+        if score < syn_factor:
+            # there are already better matching products
+            # assigned to that node
+            continue
+        if score > syn_factor:
+            # the new product has a better score
+            syn_factor = score
+            products = [product]
+            continue
+    return products, syn_factor
+
+
+# a token in a line of a semapl file: a quoted node name (where the second
+# group is empty when the closing quote is missing) or a relation symbol
+_TOKEN_PATTERN = re.compile(r'"([^"]*)("?)|([=^<])')
+
+_RELATION_SYMBOLS = {
+    "=": RelationType.same,
+    "^": RelationType.broader,
+    "<": RelationType.derived,
+}
+
+
 def parse_text(text: str) -> Graph:
     """ Reads a graph from the given text. """
     g = Graph()
     for line in text.splitlines():
-        line = line.strip()
-        if line == "" or line.startswith("#"):
+        _parse_line(line, g)
+    return g
+
+
+def _parse_line(line: str, g: Graph):
+    """ Parses the relations from the given line into the given graph. """
+    line = line.strip()
+    if line == "" or line.startswith("#"):
+        return
+    source = None
+    buffer = ""
+    for name, closed, symbol in _TOKEN_PATTERN.findall(line):
+        if symbol != "":
+            if source is not None and buffer != "":
+                g.add_relation(
+                    Relation(source, buffer, _RELATION_SYMBOLS[symbol]))
+                buffer = ""
             continue
+        if closed == "":
+            # the quote is not closed
+            return
+        buffer = name
+        if source is None:
+            if buffer == "":
+                return
+            source = buffer
 
-        in_quotes = False
-        source = None
-        buffer = ""
-        for char in line:
 
-            if not in_quotes:
-                if char == '"':
-                    in_quotes = True
-                    buffer = ""
-                    continue
-                if char.isspace() or char == ",":
-                    continue
-                if char in ("=", "^", "<"):
-                    if source is not None and buffer != "":
-                        rtype = None
-                        if char == "=":
-                            rtype = RelationType.same
-                        if char == "^":
-                            rtype = RelationType.broader
-                        if char == "<":
-                            rtype = RelationType.derived
-                        rel = Relation(source, buffer, rtype)
-                        g.add_relation(rel)
-                        buffer = ""
-
-            if in_quotes:
-                if char != '"':
-                    buffer += char
-                    continue
-                in_quotes = False
-                if source is None:
-                    if buffer == "":
-                        break
-                    source = buffer
-                    continue
+def read_file(fpath: str, encoding="utf-8") -> Graph:
+    """ Reads a graph from the given file line by line. Files with a `.gz`
+        extension are read as gzip files. """
+    g = Graph()
+    if fpath.endswith(".gz"):
+        f = gzip.open(fpath, "rt", encoding=encoding)
+    else:
+        f = open(fpath, "r", encoding=encoding)
+    with f:
+        for raw in f:
+            # same line breaks as in `parse_text`
+            for line in raw.splitlines():
+                _parse_line(line, g)
     return g
 
 
-def read_file(fpath: str, encoding="utf-8") -> Graph:
-    with open(fpath, "r", encoding=encoding) as f:
-        text = f.read()
-        return parse_text(text)
+def write_file(g: Graph, fpath: str, encoding="utf-8", compress=None):
+    """ Writes the given graph with its linked products to the given file.
+        The text is streamed node by node through a buffered file handle.
+        If `compress` is `True` (or `None` and the file name ends with
+        `.gz`) the file is written in gzip format. """
+    if compress is None:
+        compress = fpath.endswith(".gz")
+    if compress:
+        f = gzip.open(fpath, "wt", encoding=encoding)
+    else:
+        f = open(fpath, "w", encoding=encoding, buffering=1 << 16)
+    with f:
+        for text in iter_semapl(g):
+            f.write(text)
 
 
-def write_file(g: Graph, fpath: str, encoding="utf-8"):
-    lines = set()
-    text = ''
+def iter_semapl(g: Graph):
+    """ Generates the semapl text of the given graph with its linked products
+        in chunks (one chunk per node). """
     nodes = list(g.nodes)
     nodes.sort()
+
+    # a broader relation and its inverse narrower relation have the same
+    # semapl representation; when we write such a relation we remember it
+    # if the node of the inverse relation comes later, so that we can skip
+    # it there
+    pending = set()
     for node in nodes:
-        wrote_header = False
+        lines = set()
+        chunk = []
         for r in g.relations_of(node):  # type: Relation
             s = r.semapl()
             if s in lines:
                 continue
             lines.add(s)
-            if not wrote_header:
-                text += "# %s\n" % node
-                wrote_header = True
-            text += s + "\n"
-        if wrote_header:
-            text += "\n"
+            if s in pending:
+                pending.discard(s)
+                continue
+            if len(chunk) == 0:
+                chunk.append("# %s\n" % node)
+            chunk.append(s + "\n")
+            if r.rtype in (RelationType.broader, RelationType.narrower) \
+                    and r.target > node and (r.target, node) in g._links:
+                pending.add(s)
+        if len(chunk) > 0:
+            chunk.append("\n")
+            yield "".join(chunk)
 
     # write possible product relations
     wrote_product_header = False
@@ -426,15 +700,469 @@ def write_file(g: Graph, fpath: str, encoding="utf-8"):
         products = g._product_infos.get(node)
         if products is None:
             continue
+        chunk = []
         if not wrote_product_header:
-            text += "\n# linked products; remove them for" \
-                    " restoring the original graph\n"
+            chunk.append("\n# linked products; remove them for"
+                         " restoring the original graph\n")
             wrote_product_header = True
-        text += "# %s\n" % node
+        chunk.append("# %s\n" % node)
         syn_factor = g._syn_factors.get(node, 0.0)
         for p in products:  # type: backs.ProductInfo
-            text += '"%s" , "%s"^%f\n' % (p.product_name, node, syn_factor)
-        text += "\n"
+            chunk.append('"%s" , "%s"^%f\n' % (
+                p.product_name, node, syn_factor))
+        chunk.append("\n")
+        yield "".join(chunk)
+
+
+# the binary graph format: a header with a magic number, the format version,
+# and the (offset, size) pairs of the sections; each section starts at an
+# 8-byte aligned offset
+_BINARY_MAGIC = b"PSLGRAPH"
+_BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct("<8sI4x")
+_BINARY_SECTION = struct.Struct("<QQ")
+_BINARY_SECTIONS = (
+    "node_offsets",     # uint64[n + 1]: offsets of the nodes in node_bytes
+    "node_bytes",       # the UTF-8 encoded node names in sorted order
+    "edge_offsets",     # uint64[n + 1]: offsets of the edges of a node
+    "edge_targets",     # uint32[e]: the target node IDs
+    "edge_types",       # uint8[e]: the relation types
+    "product_offsets",  # uint64[6 * p + 1]: offsets of the product fields
+    "product_bytes",    # the UTF-8 encoded product fields
+    "link_offsets",     # uint64[n + 1]: offsets of the products of a node
+    "link_products",    # uint32[l]: the linked product IDs
+    "syn_factors",      # float64[n]: the syntax factors of the nodes
+)
+_BINARY_DTYPES = {
+    "node_offsets": numpy.uint64,
+    "node_bytes": numpy.uint8,
+    "edge_offsets": numpy.uint64,
+    "edge_targets": numpy.uint32,
+    "edge_types": numpy.uint8,
+    "product_offsets": numpy.uint64,
+    "product_bytes": numpy.uint8,
+    "link_offsets": numpy.uint64,
+    "link_products": numpy.uint32,
+    "syn_factors": numpy.float64,
+}
+_PRODUCT_FIELDS = [f.name for f in dataclasses.fields(backs.ProductInfo)]
+
+
+def save_binary(g: Graph, fpath: str):
+    """ Saves the given graph with its linked products in a compact binary
+        format that can be loaded with `load_binary`. Node names and product
+        fields are stored as interned UTF-8 strings; the edges as CSR arrays
+        (offsets, target IDs, and relation type codes). """
+    nodes = sorted(g.nodes)
+    ids = {node: i for i, node in enumerate(nodes)}
+
+    def pack_strings(strings) -> tuple:
+        offsets = [0]
+        data = bytearray()
+        for s in strings:
+            data += s.encode("utf-8")
+            offsets.append(len(data))
+        return numpy.array(offsets, dtype=numpy.uint64), bytes(data)
+
+    node_offsets, node_bytes = pack_strings(nodes)
+
+    edge_offsets = [0]
+    edge_targets = []
+    edge_types = []
+    for node in nodes:
+        for r in g.relations_of(node):  # type: Relation
+            edge_targets.append(ids[r.target])
+            edge_types.append(r.rtype.value)
+        edge_offsets.append(len(edge_targets))
+
+    # the linked products; products that are linked to multiple nodes are
+    # stored only once
+    product_ids = {}
+    products = []
+    link_offsets = [0]
+    link_products = []
+    syn_factors = numpy.zeros(len(nodes), dtype=numpy.float64)
+    for i, node in enumerate(nodes):
+        infos = g._product_infos.get(node)
+        if infos is not None:
+            for info in infos:
+                pid = product_ids.get(id(info))
+                if pid is None:
+                    pid = len(products)
+                    product_ids[id(info)] = pid
+                    products.append(info)
+                link_products.append(pid)
+            syn_factors[i] = g._syn_factors.get(node, 0.0)
+        link_offsets.append(len(link_products))
+    product_offsets, product_bytes = pack_strings(
+        str(getattr(info, field)) for info in products
+        for field in _PRODUCT_FIELDS)
+
+    sections = {
+        "node_offsets": node_offsets.tobytes(),
+        "node_bytes": node_bytes,
+        "edge_offsets": numpy.array(edge_offsets, numpy.uint64).tobytes(),
+        "edge_targets": numpy.array(edge_targets, numpy.uint32).tobytes(),
+        "edge_types": numpy.array(edge_types, numpy.uint8).tobytes(),
+        "product_offsets": product_offsets.tobytes(),
+        "product_bytes": product_bytes,
+        "link_offsets": numpy.array(link_offsets, numpy.uint64).tobytes(),
+        "link_products": numpy.array(link_products, numpy.uint32).tobytes(),
+        "syn_factors": syn_factors.tobytes(),
+    }
+
+    with open(fpath, "wb") as f:
+        offset = _BINARY_HEADER.size + \
+            len(_BINARY_SECTIONS) * _BINARY_SECTION.size
+        table = []
+        for name in _BINARY_SECTIONS:
+            offset = _align8(offset)
+            table.append((offset, len(sections[name])))
+            offset += len(sections[name])
+        f.write(_BINARY_HEADER.pack(_BINARY_MAGIC, _BINARY_VERSION))
+        for entry in table:
+            f.write(_BINARY_SECTION.pack(*entry))
+        for name, (offset, _) in zip(_BINARY_SECTIONS, table):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(sections[name])
+
+
+def _align8(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def load_binary(fpath: str) -> "BinaryGraph":
+    """ Loads a graph from a file that was written with `save_binary`. The
+        file is memory mapped so that processes that load the same file share
+        its pages. """
+    return BinaryGraph(fpath)
+
+
+class BinaryGraph(object):
+    """ A read-only graph that is backed by a memory mapped file in the binary
+        format of `save_binary`. The nodes are identified by their position
+        (ID) in the sorted list of node names. Nothing is decoded when the
+        file is opened; node names, relations, and products are decoded on
+        access. Use `to_graph` to get a mutable `Graph`. """
+
+    def __init__(self, fpath: str):
+        with open(fpath, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = _BINARY_HEADER.unpack_from(self._mmap, 0)
+        if magic != _BINARY_MAGIC or version != _BINARY_VERSION:
+            self._mmap.close()
+            raise ValueError("%s is not a binary graph file of version %i"
+                             % (fpath, _BINARY_VERSION))
+        arrays = {}
+        pos = _BINARY_HEADER.size
+        for name in _BINARY_SECTIONS:
+            offset, size = _BINARY_SECTION.unpack_from(self._mmap, pos)
+            pos += _BINARY_SECTION.size
+            dtype = numpy.dtype(_BINARY_DTYPES[name])
+            arrays[name] = numpy.frombuffer(
+                self._mmap, dtype=dtype, count=size // dtype.itemsize,
+                offset=offset)
+        self.node_offsets = arrays["node_offsets"]
+        self.node_bytes = arrays["node_bytes"]
+        self.edge_offsets = arrays["edge_offsets"]
+        self.edge_targets = arrays["edge_targets"]
+        self.edge_types = arrays["edge_types"]
+        self.product_offsets = arrays["product_offsets"]
+        self.product_bytes = arrays["product_bytes"]
+        self.link_offsets = arrays["link_offsets"]
+        self.link_products = arrays["link_products"]
+        self.syn_factors = arrays["syn_factors"]
+        self._products = {}
+
+    def __len__(self):
+        return len(self.node_offsets) - 1
+
+    def close(self):
+        """ Releases the memory mapped file. The arrays of this graph cannot
+            be used anymore after this. If views of these arrays are still
+            in use, the file is released when they are garbage collected. """
+        if self._mmap is None:
+            return
+        for name in _BINARY_SECTIONS:
+            setattr(self, name, None)
+        self._products = {}
+        m = self._mmap
+        self._mmap = None
+        try:
+            m.close()
+        except BufferError:
+            # there are still exported views of the mapped arrays; closing
+            # the map is then left to the garbage collector
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _node_data(self, node_id: int) -> bytes:
+        start = int(self.node_offsets[node_id])
+        end = int(self.node_offsets[node_id + 1])
+        return self.node_bytes[start:end].tobytes()
+
+    def node(self, node_id: int) -> str:
+        """ Returns the name of the node with the given ID. """
+        return self._node_data(node_id).decode("utf-8")
+
+    def nodes(self):
+        """ Generates the node names in sorted order. """
+        for i in range(len(self)):
+            yield self.node(i)
+
+    def node_id(self, node: str) -> int:
+        """ Returns the ID of the given node or -1 if it is not in the graph.
+            This is a binary search over the sorted node names (the order of
+            UTF-8 bytes is the same as the order of the code points). """
+        key = node.encode("utf-8")
+        lo = 0
+        hi = len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._node_data(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._node_data(lo) == key:
+            return lo
+        return -1
+
+    def relations_of(self, source_node: str) -> list:
+        """ Get all direct relations where the given node is the source node
+            (see `Graph.relations_of`). """
+        i = self.node_id(source_node)
+        if i < 0:
+            return []
+        start = int(self.edge_offsets[i])
+        end = int(self.edge_offsets[i + 1])
+        return [Relation(source_node, self.node(int(t)), RelationType(int(r)))
+                for t, r in zip(self.edge_targets[start:end],
+                                self.edge_types[start:end])]
+
+    def product(self, product_id: int) -> backs.ProductInfo:
+        """ Returns the product with the given ID. The same instance is
+            returned for the same ID. """
+        info = self._products.get(product_id)
+        if info is not None:
+            return info
+        info = backs.ProductInfo()
+        n = len(_PRODUCT_FIELDS)
+        for k, field in enumerate(_PRODUCT_FIELDS):
+            start = int(self.product_offsets[product_id * n + k])
+            end = int(self.product_offsets[product_id * n + k + 1])
+            setattr(info, field,
+                    self.product_bytes[start:end].tobytes().decode("utf-8"))
+        self._products[product_id] = info
+        return info
+
+    def products_of(self, node: str) -> list:
+        """ Returns the products that are linked to the given node. """
+        i = self.node_id(node)
+        if i < 0:
+            return []
+        start = int(self.link_offsets[i])
+        end = int(self.link_offsets[i + 1])
+        return [self.product(int(p)) for p in self.link_products[start:end]]
+
+    def to_graph(self) -> Graph:
+        """ Creates a mutable `Graph` with the nodes, relations, and linked
+            products of this binary graph. """
+        g = Graph()
+        names = list(self.nodes())
+        for name in names:
+            g._add_node(name)
+        types = [RelationType(int(r)) for r in self.edge_types]
+        targets = [names[int(t)] for t in self.edge_targets]
+        offsets = self.edge_offsets.tolist()
+        link_offsets = self.link_offsets.tolist()
+        for i, name in enumerate(names):
+            start = offsets[i]
+            end = offsets[i + 1]
+            if start < end:
+                g.edges[name] = [Relation(name, targets[k], types[k])
+                                 for k in range(start, end)]
+                for k in range(start, end):
+                    g._links.add((name, targets[k]))
+            start = link_offsets[i]
+            end = link_offsets[i + 1]
+            if start < end:
+                g._product_infos[name] = [
+                    self.product(int(p))
+                    for p in self.link_products[start:end]]
+                g._syn_factors[name] = float(self.syn_factors[i])
+        return g
+
+
+# the relation factors by the values of the relation types
+_RELATION_FACTORS = numpy.array(
+    [Relation("", "", rtype).factor() for rtype in RelationType],
+    dtype=numpy.float64)
+
+
+class CsrGraph(object):
+    """ An immutable graph for fast product searches. The nodes are identified
+        by integer IDs and the edges are stored as NumPy CSR arrays: for a node
+        `i` the edges are in the range `offsets[i]:offsets[i + 1]` of the
+        `targets` and `factors` arrays where `factors` contains the
+        pre-computed relation factors of the edges (see `Relation.factor`).
+        Use `from_graph` or `from_binary` to create an instance. """
+
+    def __init__(self, names: list, offsets: numpy.ndarray,
+                 targets: numpy.ndarray, factors: numpy.ndarray,
+                 products: list, syn_factors: numpy.ndarray):
+        self.names = names
+        self.ids = {name: i for i, name in enumerate(names)}
+        self.offsets = offsets
+        self.targets = targets
+        self.factors = factors
+        # the linked products of a node (or None) by node ID
+        self.products = products
+        self.syn_factors = syn_factors
+        self._adjacency_lists = None
+
+        # an inverted index keyword->node IDs
+        self._keyword_index = {}
+        for i, name in enumerate(names):
+            for keyword in symap.keywords(name):
+                ids = self._keyword_index.get(keyword)
+                if ids is None:
+                    ids = []
+                    self._keyword_index[keyword] = ids
+                ids.append(i)
+
+    @staticmethod
+    def from_graph(g: Graph) -> "CsrGraph":
+        """ Creates a CSR graph from the given graph. """
+        names = sorted(g.nodes)
+        ids = {name: i for i, name in enumerate(names)}
+        offsets = [0]
+        targets = []
+        types = []
+        products = []
+        syn_factors = numpy.zeros(len(names), dtype=numpy.float64)
+        for i, name in enumerate(names):
+            for r in g.relations_of(name):  # type: Relation
+                targets.append(ids[r.target])
+                types.append(r.rtype.value)
+            offsets.append(len(targets))
+            products.append(g._product_infos.get(name))
+            syn_factors[i] = g._syn_factors.get(name, 0.0)
+        return CsrGraph(
+            names,
+            numpy.array(offsets, dtype=numpy.int64),
+            numpy.array(targets, dtype=numpy.int64),
+            _RELATION_FACTORS[numpy.array(types, dtype=numpy.intp)],
+            products,
+            syn_factors)
+
+    @staticmethod
+    def from_binary(b: BinaryGraph) -> "CsrGraph":
+        """ Creates a CSR graph from the given binary graph. The edge arrays
+            are copied out of the memory mapped file so that the CSR graph can
+            be used after the binary graph was closed. """
+        names = list(b.nodes())
+        products = []
+        for i in range(len(names)):
+            start = int(b.link_offsets[i])
+            end = int(b.link_offsets[i + 1])
+            if start == end:
+                products.append(None)
+                continue
+            products.append([b.product(int(p))
+                             for p in b.link_products[start:end]])
+        return CsrGraph(
+            names,
+            numpy.array(b.edge_offsets, copy=True),
+            numpy.array(b.edge_targets, copy=True),
+            _RELATION_FACTORS[b.edge_types],
+            products,
+            numpy.array(b.syn_factors, copy=True))
+
+    def _adjacency(self) -> tuple:
+        """ Returns the CSR arrays as Python lists which are much faster to
+            access element-wise in the traversal than NumPy arrays; they are
+            created on the first search. """
+        if self._adjacency_lists is None:
+            self._adjacency_lists = (self.offsets.tolist(),
+                                     self.targets.tolist(),
+                                     self.factors.tolist())
+        return self._adjacency_lists
+
+    def find_nodes(self, name: str, matcher=symap.words_equality) -> list:
+        """ Same as `Graph.find_nodes` but returns tuples (score, node ID). """
+        ids = set()
+        if matcher in _KEYWORD_MATCHERS:
+            for keyword in symap.keywords(name):
+                k_ids = self._keyword_index.get(keyword)
+                if k_ids is not None:
+                    ids.update(k_ids)
+        else:
+            ids = range(len(self.names))
+        matches = []
+        for i in ids:
+            score = matcher(self.names[i], name)
+            if not isinstance(score, (int, float)):
+                continue
+            if score > 1e-16:
+                matches.append((score, i))
+        return matches
+
+    def find_products(self, name: str) -> list:
+        """ Searches the graph for matching products for the given name like
+            `Graph.find_products`. A node gets the maximum product of the
+            matching score of a start node and the relation factors along a
+            path from that node. These scores are calculated with a priority
+            queue (Dijkstra with max-product instead of min-sum) so that each
+            node is visited only once. The same products with the same 1e-3
+            tolerance for the maximum score are selected; they are returned
+            in descending order of their scores (which can differ from the
+            order of `Graph.find_products`). """
+        matches = self.find_nodes(name)
+        if len(matches) == 0:
+            return []
+
+        offsets, targets, factors = self._adjacency()
+        scores = [0.0] * len(self.names)
+        settled = bytearray(len(self.names))
+        queue = []
+        for score, i in matches:
+            scores[i] = score
+            queue.append((-score, i))
+        heapq.heapify(queue)
+
+        # the selected products as list of tuples:
+        # (syn_factor * relation_factor, product_info)
+        products = []
+        while len(queue) > 0:
+            neg_factor, i = heapq.heappop(queue)
+            if settled[i]:
+                continue
+            settled[i] = 1
+            rel_factor = -neg_factor
+
+            # collect the products from the node
+            n_products = self.products[i]
+            if n_products is not None:
+                syn_factor = float(self.syn_factors[i])
+                for p in n_products:
+                    products.append((rel_factor * syn_factor, p))
+
+            # visit the next nodes
+            for k in range(offsets[i], offsets[i + 1]):
+                target = targets[k]
+                if settled[target]:
+                    continue
+                next_factor = rel_factor * factors[k]
+                if next_factor < 1e-16:
+                    continue
+                if next_factor > scores[target]:
+                    scores[target] = next_factor
+                    heapq.heappush(queue, (-next_factor, target))
 
-    with open(fpath, "w", encoding=encoding) as f:
-        f.write(text)
+        products.sort(key=lambda p: -p[0])
+        return _select_max_products(products)
@@ -3,8 +3,9 @@ This module contains a set of functions for mapping process and product names
 based on string similarity measures.
 """
 
+import functools
 import os
-from functools import reduce
+import re
 
 import jellyfish
 import numpy
@@ -13,24 +14,37 @@ import scipy.optimize
 
 _stop_words = None
 
+# a word is a sequence of alphanumeric characters and hyphens
+_WORD_PATTERN = re.compile(r"(?:[^\W_]|-)+")
 
-def stopwords() -> set:
-    """ Returns a list of stopwords. """
+_LCI_TERMS = ("production mix", "at plant")
+
+
+def stopwords() -> frozenset:
+    """ Returns the set of stopwords. """
     global _stop_words
     if _stop_words is not None:
         return _stop_words
     folder = os.path.dirname(__file__)
-    _stop_words = set()
+    words = set()
     with open(folder + os.sep + 'data' + os.sep + 'stopwords.txt',
               'r', encoding='utf-8') as f:
         for line in f:
-            _stop_words.add(line.strip())
+            words.add(line.strip())
+    _stop_words = frozenset(words)
     return _stop_words
 
 
 def add_stopword(w: str):
+    """ Adds the given word to the stopwords. This clears the keyword cache
+        as the keywords of a phrase can change with a new stopword. """
+    global _stop_words
+    word = w.strip().lower()
     sw = stopwords()
-    sw.add(w.strip().lower())
+    if word in sw:
+        return
+    _stop_words = sw | {word}
+    _keywords.cache_clear()
 
 
 def is_stopword(word: str) -> bool:
@@ -45,26 +59,34 @@ def keywords(phrase: str, strip_lci_terms=False) -> set:
         keyword is a word that is not a stopword. """
     if not isinstance(phrase, str):
         return set()
+    return set(_keywords(phrase, strip_lci_terms))
+
+
+def keywords_cache_info():
+    """ Returns the statistics (hits, misses, maxsize, currsize) of the
+        keyword cache. """
+    return _keywords.cache_info()
+
+
+def _frozen_keywords(phrase: str) -> frozenset:
+    """ Same as `keywords` but returns the shared, immutable set from the
+        cache. """
+    if not isinstance(phrase, str):
+        return frozenset()
+    return _keywords(phrase, False)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _keywords(phrase: str, strip_lci_terms: bool) -> frozenset:
+    """ The cached implementation of `keywords`. As the returned set is shared
+        between callers, it is immutable. """
     feed = phrase.lower()
     if strip_lci_terms:
-        lci_terms = ["production mix", "at plant"]
-        for lci_term in lci_terms:
+        for lci_term in _LCI_TERMS:
             feed = feed.replace(lci_term, "")
-
-    p = set()
-    buffer = ""
-    for char in feed:
-        if char.isalnum() or char == "-":
-            buffer = buffer + char
-            continue
-        if buffer == "":
-            continue
-        if not is_stopword(buffer):
-            p.add(buffer.lower())
-        buffer = ""
-    if buffer != "" and not is_stopword(buffer):
-        p.add(buffer.lower())
-    return p
+    sw = stopwords()
+    return frozenset(
+        w for w in _WORD_PATTERN.findall(feed) if w not in sw)
 
 
 def qpartition(s: str) -> tuple:
@@ -88,69 +110,119 @@ def best_match(s: str, phrases: list) -> str:
     if len(phrases) == 0:
         return ""
 
-    terms = keywords(s)
+    terms = _frozen_keywords(s)
     if len(terms) == 0:
         return ""
 
-    candidate = None
+    pos, _ = best_match_many(terms, phrases)
+    return phrases[pos] if pos >= 0 else None
+
+
+def best_match_many(terms, phrases: list) -> tuple:
+    """ Scores the given query against all phrases in the given list based on
+        the similarity of their keywords (see `words_similarity`). The query
+        can be a string or a collection of keywords. It returns a tuple
+        (position, score) of the first phrase with the highest score or
+        `(-1, 0.0)` if there is no phrase with keywords. Cheap upper bounds of
+        the scores are used to skip phrases that cannot win before the
+        optimal assignment of their keywords is calculated. """
+    if isinstance(terms, str):
+        terms = _frozen_keywords(terms)
+    terms = list(terms)
+    if len(terms) == 0:
+        return -1, 0.0
+
+    best = -1
     score = 0.0
-    for phrase in phrases:
-        comps = keywords(phrase)
+    for pos, phrase in enumerate(phrases):
+        comps = _frozen_keywords(phrase)
         if len(comps) == 0:
             continue
-        c_score = words_similarity(terms, comps)
-        if candidate is None or c_score > score:
-            candidate = phrase
+        rows = len(terms)
+        cols = len(comps)
+        n = max(rows, cols)
+        # each similarity is <= 1; so the score is at most min(rows, cols) / n
+        if best >= 0 and min(rows, cols) / n <= score - 1e-12:
+            continue
+        mat = similarity_matrix(terms, list(comps))
+        # each keyword can be assigned at most once; so the score is at most
+        # the sum of the row (or column) maxima
+        if best >= 0:
+            bound = min(mat.max(axis=1).sum(), mat.max(axis=0).sum()) / n
+            if bound <= score - 1e-12:
+                continue
+        c_score = _assignment_score(mat)
+        if best < 0 or c_score > score:
+            best = pos
             score = c_score
-
-    return candidate
+    return best, score
 
 
 def words_similarity(words_a, words_b) -> float:
     """ Calculate the similarity of the given word lists a and b. """
     if len(words_a) == 0 or len(words_b) == 0:
         return 0.0
-    # create a matrix with the string similarities and calculate
-    # the best score using the "Hungarian method"
-    # (see https://en.wikipedia.org/wiki/Hungarian_algorithm).
-    # we use negative values for the similarities in the matrix
-    # because the implementation in SciPy searches for the minimum
-    # https://docs.scipy.org/doc/scipy-0.18.1/reference/generated/scipy.optimize.linear_sum_assignment.html
-
     if not isinstance(words_a, list):
         words_a = list(words_a)
     if not isinstance(words_b, list):
         words_b = list(words_b)
+    return _assignment_score(similarity_matrix(words_a, words_b))
 
-    rows = len(words_a)
-    cols = len(words_b)
-    mat = numpy.zeros((rows, cols))
-    for row in range(0, rows):
-        for col in range(0, cols):
-            mat[row, col] = -similarity(words_a[row], words_b[col])
-    row_ind, col_ind = scipy.optimize.linear_sum_assignment(mat)
+
+def _assignment_score(mat: numpy.ndarray) -> float:
+    """ Calculates the score of the best assignment of the rows and columns
+        of the given similarity matrix. """
+    # we calculate the best score using the "Hungarian method"
+    # (see https://en.wikipedia.org/wiki/Hungarian_algorithm).
+    # we use negative values for the similarities in the matrix
+    # because the implementation in SciPy searches for the minimum
+    # https://docs.scipy.org/doc/scipy-0.18.1/reference/generated/scipy.optimize.linear_sum_assignment.html
+    neg = -mat
+    row_ind, col_ind = scipy.optimize.linear_sum_assignment(neg)
 
     # dividing the score by the number of keywords considers unmatched
     # keywords; however, this is not perfect when the number of keywords
     # is small
-    n = max(rows, cols)
-    return abs(mat[row_ind, col_ind].sum()) / n
+    n = max(mat.shape)
+    return abs(neg[row_ind, col_ind].sum()) / n
+
+
+def similarity_matrix(words_a: list, words_b: list) -> numpy.ndarray:
+    """ Returns a matrix with the similarities (see `similarity`) of all pairs
+        of the given words where the rows are the words in `a` and the columns
+        the words in `b`. The similarities of word pairs are cached, so that
+        repeated words are compared only once. """
+    rows = len(words_a)
+    cols = len(words_b)
+    values = numpy.fromiter(
+        (_cached_similarity(a, b) for a in words_a for b in words_b),
+        dtype=float, count=rows * cols)
+    return values.reshape((rows, cols))
+
+
+@functools.lru_cache(maxsize=1 << 18)
+def _cached_similarity(a: str, b: str) -> float:
+    return similarity(a, b)
 
 
 def words_equality(phrase_a: str, phrase_b: str) -> float:
-    def len_red(x: int, y: str):
-        return x + len(y)
+    a = _frozen_keywords(phrase_a)
+    b = _frozen_keywords(phrase_b)
+    return _keywords_equality(a, _keywords_length(a), b, _keywords_length(b))
 
-    a = keywords(phrase_a)
-    len_a = reduce(len_red, a, 0)
-    b = keywords(phrase_b)
-    len_b = reduce(len_red, b, 0)
+
+def _keywords_length(words) -> int:
+    return sum(len(w) for w in words)
+
+
+def _keywords_equality(a, len_a: int, b, len_b: int) -> float:
+    """ The `words_equality` of two keyword sets with the given (pre-computed)
+        total lengths of their keywords. """
     n = max(len_a, len_b)
     s = 0
     for wa in a:
         if wa in b:
             s += len(wa)
-            b.remove(wa)
     return s / n
 
 
@@ -162,6 +234,67 @@ def compare_with_lci_name(product_name: str, lci_name: str) -> float:
     return score
 
 
+class LciNameIndex(object):
+    """ An index of LCI product names for comparing many product names with
+        them. Each LCI name is parsed only once into the keywords of its base
+        name and qualifiers (see `qpartition`). An inverted index keyword->name
+        is then used to score only the LCI names that share a keyword with a
+        product name. The scores are the same as calculated by
+        `compare_with_lci_name`. """
+
+    def __init__(self, lci_names: list):
+        # for each LCI name a list of (keywords, keyword length) tuples of
+        # the base name (first item) and the qualifiers
+        self._parts = []
+        # keyword -> sorted list of LCI name positions
+        self._index = {}
+        for pos, lci_name in enumerate(lci_names):
+            base_name, qualifiers = qpartition(lci_name)
+            parts = []
+            for part in [base_name] + qualifiers:
+                words = _frozen_keywords(part)
+                parts.append((words, _keywords_length(words)))
+                for word in words:
+                    positions = self._index.get(word)
+                    if positions is None:
+                        positions = []
+                        self._index[word] = positions
+                    if len(positions) == 0 or positions[-1] != pos:
+                        positions.append(pos)
+            self._parts.append(parts)
+
+    def __len__(self):
+        return len(self._parts)
+
+    def candidates(self, product_name: str) -> list:
+        """ Returns the sorted positions of the LCI names that have at least
+            one keyword in common with the given product name. """
+        positions = set()
+        for word in _frozen_keywords(product_name):
+            p = self._index.get(word)
+            if p is not None:
+                positions.update(p)
+        return sorted(positions)
+
+    def compare(self, product_name: str) -> list:
+        """ Compares the given product name with the indexed LCI names. It
+            returns a list of tuples (position, score) for the LCI names that
+            share a keyword with the product name in the order of their
+            positions. """
+        words = _frozen_keywords(product_name)
+        length = _keywords_length(words)
+        scores = []
+        for pos in self.candidates(product_name):
+            parts = self._parts[pos]
+            base_words, base_length = parts[0]
+            score = _keywords_equality(words, length, base_words, base_length)
+            for q_words, q_length in parts[1:]:
+                score += 0.25 * _keywords_equality(
+                    words, length, q_words, q_length)
+            scores.append((pos, score))
+        return scores
+
+
 def similarity(a: str, b: str) -> float:
     """ Calculates a value between 0 and 1 that describes the similarity of
         the given strings `a` and `b` where 0 means completely different and `1`
@@ -0,0 +1,233 @@
+"""
+This module contains functions for reading the rows of component trees. A
+component tree is stored in the sheets of a file where each row contains a
+part with its parent part. The rows are read into plain `TreeRow` objects so
+that the files can be also parsed in separate processes.
+
+The files are read with readers that are registered for the file extensions.
+A reader is a function that takes a file path and lazily yields the sheets of
+that file as `TreeSheet` objects where the rows of a sheet are an iterator of
+`TreeRow` objects. The rows of a sheet need to be consumed before the next
+sheet is requested. By default, there are readers for XLSX files (using the
+read-only mode of `openpyxl`) and CSV and TSV files (UTF-8 encoded). The
+reader for XLS files (using `xlrd`) is not registered by default as the data
+folder can contain other XLS files; it can be registered with:
+
+    trees.register_reader(".xls", trees.read_xls)
+
+Readers with other options, e.g. for CSV files in another encoding, can be
+registered in the same way:
+
+    trees.register_reader(".csv", functools.partial(
+        trees.read_csv, encoding="cp1252"))
+
+In all formats, the first row is a header row and the columns are:
+
+    Level | Part number | - | Quantity | Name | Parent part number
+
+The rows of a sheet are read until the first row without a part number.
+"""
+
+import concurrent.futures
+import csv
+import logging as log
+import os
+
+from dataclasses import dataclass, field
+
+import openpyxl
+import xlrd
+
+# file extension -> reader function
+_READERS = {}
+
+
+@dataclass
+class TreeRow:
+    """A row of a component tree; the values are the stripped cell texts."""
+    row: int = 0
+    level: str = ''
+    part_number: str = ''
+    name: str = ''
+    parent: str = ''
+    quantity: str = ''
+
+
+@dataclass
+class TreeSheet:
+    """The rows of a sheet of a component tree file. When the sheet is read
+    lazily, the rows are an iterator instead of a list."""
+    file: str = ''
+    name: str = ''
+    rows: list = field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        return "%s/%s" % (os.path.basename(self.file), self.name)
+
+
+def register_reader(extension: str, reader):
+    """ Registers a reader function for the files with the given extension,
+        e.g. `.xlsx`. """
+    _READERS[extension.lower()] = reader
+
+
+def is_tree_file(fpath: str) -> bool:
+    """ Returns true when there is a reader for the given file. """
+    return os.path.splitext(fpath)[1].lower() in _READERS
+
+
+def find_files(folder: str) -> list:
+    """ Returns the sorted paths of the files in the given folder for which a
+        reader is registered. """
+    files = []
+    with os.scandir(folder) as entries:
+        for entry in entries:  # type: os.DirEntry
+            if entry.is_file() and is_tree_file(entry.name):
+                files.append(entry.path)
+    files.sort()
+    return files
+
+
+def iter_sheets(fpath: str):
+    """ Lazily yields the sheets of the given file. """
+    reader = _READERS.get(os.path.splitext(fpath)[1].lower())
+    if reader is None:
+        raise ValueError("no reader registered for file %s" % fpath)
+    log.info("parse file %s", fpath)
+    return reader(fpath)
+
+
+def iter_all(fpaths: list):
+    """ Lazily yields the sheets of the given files in order. """
+    for fpath in fpaths:
+        yield from iter_sheets(fpath)
+
+
+def read_file(fpath: str) -> list:
+    """ Reads the sheets of the given file with all their rows. """
+    sheets = []
+    for sheet in iter_sheets(fpath):
+        sheets.append(TreeSheet(file=sheet.file, name=sheet.name,
+                                rows=list(sheet.rows)))
+    return sheets
+
+
+def read_all(fpaths: list, workers=1) -> list:
+    """ Reads the sheets of the given files. With `workers > 1` the files
+        are parsed in a pool of worker processes. The sheets are returned in
+        the order of the files and the sheets in the files. """
+    if workers is None or workers <= 1 or len(fpaths) < 2:
+        sheets = []
+        for fpath in fpaths:
+            sheets.extend(read_file(fpath))
+        return sheets
+    log.info("parse %i files with %i processes", len(fpaths), workers)
+    sheets = []
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(workers, len(fpaths))) as pool:
+        for file_sheets in pool.map(read_file, fpaths):
+            sheets.extend(file_sheets)
+    return sheets
+
+
+def _tree_row(r: int, values) -> TreeRow:
+    """ Creates a row from the given cell texts; it returns `None` if the row
+        has no part number. """
+    n = len(values)
+    part_number = values[1] if n > 1 else ""
+    if part_number == "":
+        return None
+    return TreeRow(
+        row=r,
+        level=values[0] if n > 0 else "",
+        part_number=part_number,
+        name=values[4] if n > 4 else "",
+        parent=values[5] if n > 5 else "",
+        quantity=values[3] if n > 3 else "")
+
+
+def read_xlsx(fpath: str):
+    """ Lazily reads the sheets of the given XLSX file. """
+    wb = openpyxl.load_workbook(fpath, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            log.info("parse sheet %s", ws.title)
+            yield TreeSheet(file=fpath, name=ws.title, rows=_xlsx_rows(ws))
+    finally:
+        wb.close()
+
+
+def _xlsx_rows(ws):
+    rows = ws.iter_rows(min_row=2, max_col=6, values_only=True)
+    for r, values in enumerate(rows, start=1):
+        row = _tree_row(r, [_value_str(v) for v in values])
+        if row is None:
+            break
+        yield row
+
+
+def _value_str(value) -> str:
+    """ Converts a cell value into a string in the same way as `xlrd` where
+        all numbers are floats. """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return str(float(value))
+    return str(value).strip()
+
+
+def read_xls(fpath: str):
+    """ Lazily reads the sheets of the given XLS file. """
+    wb = xlrd.open_workbook(fpath, on_demand=True)
+    try:
+        for sheet_name in wb.sheet_names():
+            log.info("parse sheet %s", sheet_name)
+            sheet = wb.sheet_by_name(sheet_name)
+            yield TreeSheet(file=fpath, name=sheet_name,
+                            rows=_xls_rows(sheet))
+            wb.unload_sheet(sheet_name)
+    finally:
+        wb.release_resources()
+
+
+def _xls_rows(sheet):
+    for r in range(1, sheet.nrows):
+        values = [str(sheet.cell_value(r, c)).strip()
+                  for c in range(min(6, sheet.ncols))]
+        row = _tree_row(r, values)
+        if row is None:
+            break
+        yield row
+
+
+def read_csv(fpath: str, delimiter=",", encoding="utf-8"):
+    """ Lazily reads the given CSV file as a single sheet with the name of the
+        file. """
+    name = os.path.splitext(os.path.basename(fpath))[0]
+    yield TreeSheet(file=fpath, name=name,
+                    rows=_csv_rows(fpath, delimiter, encoding))
+
+
+def read_tsv(fpath: str, encoding="utf-8"):
+    """ Lazily reads the given TSV file as a single sheet with the name of the
+        file. """
+    return read_csv(fpath, delimiter="\t", encoding=encoding)
+
+
+def _csv_rows(fpath: str, delimiter: str, encoding: str):
+    with open(fpath, "r", encoding=encoding, newline="") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        next(reader, None)
+        for r, values in enumerate(reader, start=1):
+            row = _tree_row(r, [v.strip() for v in values])
+            if row is None:
+                break
+            yield row
+
+
+register_reader(".xlsx", read_xlsx)
+register_reader(".csv", read_csv)
+register_reader(".tsv", read_tsv)
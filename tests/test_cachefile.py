@@ -0,0 +1,30 @@
+import os
+import tempfile
+import unittest
+
+import pslink.cachefile as cachefile
+
+
+class CacheFileTest(unittest.TestCase):
+
+    def test_read_write(self):
+        with tempfile.TemporaryDirectory() as folder:
+            fpath = os.path.join(folder, "out", "test.cache")
+            self.assertIsNone(cachefile.read(fpath, 1))
+            cachefile.write(fpath, 1, {"a": [1, 2]})
+            self.assertEqual({"a": [1, 2]}, cachefile.read(fpath, 1))
+            self.assertIsNone(cachefile.read(fpath, 2))
+
+            jpath = os.path.join(folder, "out", "test.json")
+            cachefile.write_json(jpath, {"version": 1, "a": "b"})
+            self.assertEqual("b", cachefile.read_json(jpath, 1)["a"])
+            self.assertIsNone(cachefile.read_json(jpath, 2))
+
+            with open(fpath, "wb") as f:
+                f.write(b"no pickle")
+            with self.assertLogs(level="WARNING"):
+                self.assertIsNone(cachefile.read(fpath, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
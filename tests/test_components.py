@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+import pslink.components as components
+
+
+class ComponentStoreTest(unittest.TestCase):
+
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as folder:
+            cfolder = os.path.join(folder, "components")
+            os.makedirs(cfolder)
+            for uid, material in [("A1", "steel"), ("B2", "copper")]:
+                with open(os.path.join(cfolder, uid + ".txt"), "w") as f:
+                    f.write("Material ; %s\n" % material)
+            with open(os.path.join(cfolder, "notes.md"), "w") as f:
+                f.write("not a component file")
+
+            store = components.ComponentStore(cfolder)
+            self.assertEqual(["A1", "B2"], store.ids())
+            self.assertTrue("A1" in store)
+            self.assertFalse("C3" in store)
+            self.assertIsNone(store.get("C3"))
+            self.assertEqual({"Material": "steel"}, store.get("A1"))
+
+            # build the cache and read it again
+            cpath = os.path.join(folder, "out", "components.cache")
+            store.use_cache(cpath)
+            self.assertTrue(os.path.isfile(cpath))
+            store = components.ComponentStore(cfolder)
+            self.assertTrue(store._read_cache(cpath, store.signature()))
+            self.assertEqual({"Material": "copper"}, store.get("B2"))
+
+            # the cache is rebuilt when a component file is added
+            with open(os.path.join(cfolder, "C3.txt"), "w") as f:
+                f.write("Material ; nickel\n")
+            store = components.ComponentStore(cfolder)
+            self.assertFalse(store._read_cache(cpath, store.signature()))
+            store.use_cache(cpath)
+            self.assertEqual({"Material": "nickel"}, store.get("C3"))
+
+        # a missing folder results in an empty store
+        store = components.ComponentStore(os.path.join(folder, "components"))
+        self.assertEqual(0, len(store))
+
+
+if __name__ == "__main__":
+    unittest.main()
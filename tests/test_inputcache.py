@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+import pslink  # registers the volume formulas
+import pslink.inputcache as inputcache
+
+
+class InputCacheTest(unittest.TestCase):
+
+    def test_material_inputs(self):
+        densities = {"steel": 7.9}
+        atts = {"Width": "1 inch", "Thickness": "0.5 inches",
+                "Length": "2 inches", "Material": "Steel"}
+        same = {" material ": "Steel", "length": "2 inches",
+                "WIDTH": "1 inch", "Thickness": "0.5 inches"}
+        other = dict(atts, Length="3 inches")
+
+        cache = inputcache.InputCache(densities)
+        inputs = cache.material_inputs(atts)
+        self.assertEqual(1, len(inputs))
+        self.assertEqual("steel", inputs[0][0])
+        self.assertEqual(inputs, cache.material_inputs(same))
+        self.assertNotEqual(inputs, cache.material_inputs(other))
+        self.assertEqual((1, 2), (cache.hits, cache.misses))
+        self.assertAlmostEqual(1 / 3, cache.hit_rate())
+
+        with tempfile.TemporaryDirectory() as folder:
+            fpath = os.path.join(folder, "out", "material_inputs.cache")
+            cache.write(fpath)
+            copy = inputcache.InputCache(dict(densities))
+            self.assertTrue(copy.read(fpath))
+            self.assertEqual(inputs, copy.material_inputs(atts))
+            self.assertEqual(1, copy.hits)
+            # other densities invalidate the cache
+            self.assertFalse(
+                inputcache.InputCache({"steel": 8.0}).read(fpath))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+import pslink.backs as backs
+import pslink.linkcache as linkcache
+import pslink.semap as semap
+import pslink.symap as symap
+
+
+GRAPH = '''
+"stainless steel" , "steel"^
+"steel"           , "ferrous metal"^
+'''
+
+
+class LinkCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.gpath = os.path.join(self.tmp.name, "product_net.semapl")
+        self.bpath = os.path.join(self.tmp.name, "background_products.txt")
+        self.cpath = os.path.join(self.tmp.name, "out",
+                                  "linked_products.cache")
+        with open(self.gpath, "w", encoding="utf-8") as f:
+            f.write(GRAPH)
+        with open(self.bpath, "w", encoding="utf-8") as f:
+            f.write("process uuid\tprocess\tproduct uuid\tproduct\n")
+            f.write("p1\tsteel production\tf1\tsteel\n")
+        self.infos = [backs.ProductInfo(process_uuid="p1"),
+                      backs.ProductInfo(process_uuid="p2")]
+
+        # restore the stopwords after the test
+        stopwords = symap.stopwords()
+
+        def restore():
+            symap._stop_words = stopwords
+            symap._keywords.cache_clear()
+        self.addCleanup(restore)
+
+    def test_round_trip(self):
+        g = semap.read_file(self.gpath)
+        g._product_infos["steel"] = [self.infos[1], self.infos[0]]
+        g._syn_factors["steel"] = 0.5
+        key = linkcache.key(self.gpath, self.bpath)
+        linkcache.write(self.cpath, key, g, self.infos)
+
+        g2 = semap.read_file(self.gpath)
+        self.assertTrue(linkcache.read(self.cpath, key, g2, self.infos))
+        self.assertEqual(["p2", "p1"], [p.process_uuid
+                                        for p in g2._product_infos["steel"]])
+        self.assertIs(self.infos[0], g2._product_infos["steel"][1])
+        self.assertEqual(0.5, g2._syn_factors["steel"])
+
+    def test_key(self):
+        key = linkcache.key(self.gpath, self.bpath)
+        self.assertEqual(key, linkcache.key(self.gpath, self.bpath))
+
+        # a changed input file
+        with open(self.gpath, "a", encoding="utf-8") as f:
+            f.write('"cast iron" , "ferrous metal"^\n')
+        changed = linkcache.key(self.gpath, self.bpath)
+        self.assertNotEqual(key, changed)
+
+        # a changed stopword set
+        symap.add_stopword("ferrous")
+        with_stopword = linkcache.key(self.gpath, self.bpath)
+        self.assertNotEqual(changed, with_stopword)
+
+        # another matcher
+        self.assertNotEqual(with_stopword, linkcache.key(
+            self.gpath, self.bpath, matcher=symap.words_equality))
+
+    def test_reject_stale_cache(self):
+        g = semap.read_file(self.gpath)
+        g._product_infos["steel"] = [self.infos[0]]
+        key = linkcache.key(self.gpath, self.bpath)
+        linkcache.write(self.cpath, key, g, self.infos)
+
+        g2 = semap.read_file(self.gpath)
+        self.assertFalse(linkcache.read(self.cpath, "other", g2, self.infos))
+        self.assertFalse(linkcache.read(self.cpath, key, g2, self.infos[:1]))
+        self.assertEqual({}, g2._product_infos)
+        missing = os.path.join(self.tmp.name, "missing.cache")
+        self.assertFalse(linkcache.read(missing, key, g2, self.infos))
+
+        # a corrupted cache file
+        with open(self.cpath, "wb") as f:
+            f.write(b"not a pickle")
+        with self.assertLogs(level="WARNING"):
+            self.assertFalse(linkcache.read(self.cpath, key, g2, self.infos))
+
+
+if __name__ == "__main__":
+    unittest.main()
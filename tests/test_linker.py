@@ -0,0 +1,201 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import pslink
+import pslink.linker as linker
+
+TREE = """Level,Part,_,Qty,Name,Parent
+0,A,,1,Assembly,
+1,B,,4,Frame,A
+2,C,,4,Bolt,B
+2,C,,3,Bolt,B
+2,D/1,,2,Plate,B
+1,E,,1,Cover,A
+2,D/1,,1,Plate,E
+x,F,,2,Label,A
+1,G,,n/a,Washer,A
+"""
+
+COMPONENTS = {
+    "C": {"Width": "0.5 inches", "Thickness": "0.5 inches",
+          "Length": "2 inches", "Material": "Steel"},
+    "D_1": {"Width": "4 inches", "Thickness": "0.1 inches",
+            "Length": "6 inches", "Material": "Steel or Copper"},
+    "E": {"Width": "8 inches", "Thickness": "0.05 inches",
+          "Length": "8 inches", "Material": "Copper"},
+    "F": {"Width": "1 inch", "Thickness": "0.01 inches",
+          "Length": "2 inches", "Material": "Steel overall"},
+}
+
+
+def make_data(folder: str, tree=TREE, more_trees=()):
+    """ Creates a small data folder with a component tree (and optionally
+        more trees in other files) in the given folder. The part G has no
+        component file. """
+    os.makedirs(os.path.join(folder, "components"))
+    with open(os.path.join(folder, "densities.txt"), "w") as f:
+        f.write("steel ; 7.9\ncopper ; 8.9\n")
+    with open(os.path.join(folder, "product_net.semapl"), "w") as f:
+        f.write('"steel" , "metal"^\n"copper" , "metal"^\n')
+    with open(os.path.join(folder, "background_products.txt"), "w") as f:
+        f.write("PROCESS_UUID\tPROCESS_NAME\tLOCATION\tFLOW_UUID\t"
+                "FLOW_NAME\tUNIT\n")
+        f.write("p1\tsteel production\tUS\tf1\tsteel\tkg\n")
+        f.write("p2\tcopper production\tUS\tf2\tcopper\tkg\n")
+    for uid, atts in COMPONENTS.items():
+        with open(os.path.join(folder, "components", uid + ".txt"), "w") as f:
+            for k, v in atts.items():
+                f.write("%s ; %s\n" % (k, v))
+    with open(os.path.join(folder, "tree.csv"), "w") as f:
+        f.write(tree)
+    for i, more in enumerate(more_trees):
+        with open(os.path.join(folder, "tree_%i.csv" % i), "w") as f:
+            f.write(more)
+
+
+def run(tree=TREE, more_trees=(), **kwargs) -> dict:
+    """ Links the data of the given tree with the given options and returns
+        the exchanges of the generated processes as sorted tuples (flow,
+        provider, amount, input) by process ID. """
+    with tempfile.TemporaryDirectory() as folder:
+        make_data(folder, tree, more_trees)
+        pslink.link(folder, **kwargs)
+        processes = {}
+        fpath = os.path.join(folder, "out", "generated_jsonld.zip")
+        with zipfile.ZipFile(fpath) as z:
+            for name in z.namelist():
+                if not name.startswith("processes/"):
+                    continue
+                p = json.loads(z.read(name))
+                exchanges = []
+                for e in p["exchanges"]:
+                    provider = e.get("defaultProvider")
+                    exchanges.append((
+                        e["flow"]["@id"],
+                        None if provider is None else provider["@id"],
+                        round(e["amount"], 9),
+                        e.get("input", False)))
+                processes[p["@id"]] = sorted(exchanges, key=repr)
+        return processes
+
+
+def read_package(folder: str) -> dict:
+    """ Reads the generated package of the given data folder into a map
+        path -> entity where the category IDs are replaced by their names and
+        the `lastChange` fields are removed. """
+    fpath = os.path.join(folder, "out", "generated_jsonld.zip")
+    with zipfile.ZipFile(fpath) as z:
+        texts = {name: z.read(name).decode("utf-8") for name in z.namelist()}
+    categories = {}
+    for name, text in texts.items():
+        if name.startswith("categories/"):
+            c = json.loads(text)
+            categories[c["@id"]] = c["name"]
+    entities = {}
+    for name, text in texts.items():
+        if name.startswith("categories/"):
+            continue
+        for uid, category in categories.items():
+            text = text.replace(uid, "category:" + category)
+        entity = json.loads(text)
+        entity.pop("lastChange", None)
+        entities[name] = entity
+    return entities
+
+
+class LinkerTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def test_prefetch_components(self):
+        serial = run()
+        self.assertEqual(serial, run(io_threads=4))
+        self.assertEqual(serial, run(io_threads=4, prefetch_materials=True))
+        # the part without a component file has only its reference flow
+        self.assertEqual([("G", None, 1.0, False)], serial["proc_G"])
+        # the materials of the components were found
+        materials = {e[0] for e in serial["proc_D_1"] if e[3]}
+        self.assertEqual(2, len(materials))
+
+    def test_aggregate_inputs(self):
+        # C is two times an input of B: 4 + 3 = 7
+        processes = run()
+        self.assertEqual(
+            [("B", None, 1.0, False), ("C", "proc_C", 7.0, True),
+             ("D_1", "proc_D_1", 2.0, True)], processes["proc_B"])
+
+    def test_separate_inputs(self):
+        processes = run(aggregate_inputs=False)
+        self.assertEqual(
+            [("B", None, 1.0, False), ("C", "proc_C", 3.0, True),
+             ("C", "proc_C", 4.0, True), ("D_1", "proc_D_1", 2.0, True)],
+            processes["proc_B"])
+
+    def test_streaming(self):
+        # the tree contains a non-numeric level (F), a child that is
+        # repeated in a sub-assembly (C in B), and a child that is used in
+        # two sub-assemblies (D/1 in B and E)
+        default = run()
+        self.assertEqual(default, run(streaming=True))
+        self.assertEqual(default, run(streaming=True, io_threads=2))
+        self.assertEqual(
+            [("D_1", "proc_D_1", 1.0, True), ("E", None, 1.0, False)],
+            [e for e in default["proc_E"] if not e[0].startswith("f")])
+
+        # a sub-assembly that is repeated later with its children and parts
+        # of an earlier file that are parents again in another file
+        tree = TREE + "1,B,,1,Frame,A\n2,C,,1,Bolt,B\n"
+        more = "Level,Part,_,Qty,Name,Parent\n" \
+               "0,B,,1,Frame,\n1,C,,2,Bolt,B\n1,H,,1,Pin,E\n"
+        repeated = run(tree, [more])
+        self.assertEqual(("B", "proc_B", 5.0, True), repeated["proc_A"][1])
+        self.assertEqual(("C", "proc_C", 10.0, True), repeated["proc_B"][1])
+        self.assertEqual(("H", "proc_H", 1.0, True), repeated["proc_E"][2])
+        self.assertEqual(repeated, run(tree, [more], streaming=True))
+        self.assertEqual(repeated, run(tree, [more], streaming=True,
+                                       workers=2))
+
+    def test_incremental(self):
+        with tempfile.TemporaryDirectory() as folder:
+            data = os.path.join(folder, "data")
+            os.makedirs(data)
+            make_data(data)
+            pslink.link(data, incremental=True)
+
+            def rebuilt() -> dict:
+                full = os.path.join(folder, "full")
+                shutil.rmtree(full, ignore_errors=True)
+                shutil.copytree(data, full,
+                                ignore=shutil.ignore_patterns("out"))
+                pslink.link(full)
+                return read_package(full)
+
+            # change a component file
+            with open(os.path.join(data, "components", "C.txt"), "w") as f:
+                f.write("Width ; 0.5 inches\nThickness ; 0.5 inches\n"
+                        "Length ; 2.5 inches\nMaterial ; Steel\n")
+            lin = linker.Linker(data, incremental=True)
+            lin.run()
+            self.assertEqual(6, lin.copied_processes)
+            self.assertEqual(7, lin.written_processes)
+            self.assertEqual(rebuilt(), read_package(data))
+
+            # add rows to the tree
+            with open(os.path.join(data, "tree.csv"), "a") as f:
+                f.write("1,H,,2,Spacer,A\n2,C,,1,Bolt,H\n")
+            lin = linker.Linker(data, incremental=True)
+            lin.run()
+            self.assertEqual(6, lin.copied_processes)
+            self.assertEqual(8, lin.written_processes)
+            self.assertEqual(rebuilt(), read_package(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
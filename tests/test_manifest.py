@@ -0,0 +1,30 @@
+import os
+import tempfile
+import unittest
+
+import pslink.manifest as manifest
+
+
+class ManifestTest(unittest.TestCase):
+
+    def test_read_write(self):
+        m = manifest.Manifest(manifest.key("a", "b"))
+        m.sheets["tree.xlsx/sheet1"] = manifest.fingerprint([["P1", "", ""]])
+        m.processes["proc_P1"] = {"hash": "42", "materials": ["steel"]}
+        with tempfile.TemporaryDirectory() as folder:
+            fpath = os.path.join(folder, "out", "manifest.json")
+            manifest.write(m, fpath)
+            copy = manifest.read(fpath)
+            self.assertEqual(m.to_json(), copy.to_json())
+            self.assertEqual("", manifest.read(fpath + ".x").key)
+
+    def test_fingerprint(self):
+        self.assertEqual(manifest.fingerprint({"a": 1, "b": [1, 2]}),
+                         manifest.fingerprint({"b": [1, 2], "a": 1}))
+        self.assertNotEqual(manifest.fingerprint([1, 2]),
+                            manifest.fingerprint([2, 1]))
+        self.assertNotEqual(manifest.key("a", "b"), manifest.key("ab"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+
+import olca
+
+import pslink.pack as pack
+
+
+class PackTest(unittest.TestCase):
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for threads, level in [(1, -1), (3, -1), (3, 9), (2, 0)]:
+                fpath = os.path.join(folder, "pack_%i_%i.zip" % (threads, level))
+                with pack.Writer(fpath, threads=threads, level=level) as w:
+                    for i in range(50):
+                        flow = olca.Flow()
+                        flow.id = "flow-%i" % i
+                        flow.name = "Flow %i" % i
+                        w.write(flow)
+                    category = olca.Category()
+                    category.id = "c"
+                    w.write(category)
+                    w.write_json({"@id": "p", "name": "ö"}, "processes")
+                    w.write_json({"name": "no ID"}, "processes")
+
+                with zipfile.ZipFile(fpath) as z:
+                    self.assertIsNone(z.testzip())
+                    names = z.namelist()
+                    self.assertEqual(52, len(names))
+                    self.assertEqual("flows/flow-0.json", names[0])
+                    self.assertEqual("processes/p.json", names[-1])
+                    flow = json.loads(z.read("flows/flow-42.json"))
+                    self.assertEqual("Flow 42", flow["name"])
+                    self.assertEqual(
+                        "ö", json.loads(z.read("processes/p.json"))["name"])
+                    method = zipfile.ZIP_STORED if level == 0 \
+                        else zipfile.ZIP_DEFLATED
+                    self.assertEqual(method, z.getinfo(names[0]).compress_type)
+                    self.assertTrue("categories/c.json" in names)
+                    # Unix permissions with Unix as host system
+                    info = z.getinfo(names[0])
+                    self.assertEqual(3, info.create_system)
+                    self.assertEqual(0o100644, info.external_attr >> 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
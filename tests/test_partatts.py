@@ -0,0 +1,38 @@
+import unittest
+
+import pslink  # registers the volume formulas
+import pslink.partatts as partatts
+
+
+class PartattsTest(unittest.TestCase):
+
+    def test_resolve(self):
+        resolver = partatts.MaterialResolver(
+            {"stainless steel": 8.0, "steel": 7.9},
+            aliases={"SS 304": "Stainless  Steel"})
+        self.assertEqual("steel", resolver.resolve(" Steel overall"))
+        self.assertEqual("stainless steel",
+                         resolver.resolve("stainless   steel inner layer"))
+        self.assertEqual("stainless steel", resolver.resolve("ss 304"))
+        self.assertIsNone(resolver.resolve("copper"))
+        self.assertAlmostEqual(8.0, resolver.density("stainless steel"))
+
+    def test_material_inputs(self):
+        atts = {"Width": "1 inch", "Thickness": "0.5 inches",
+                "Length": "2 inches",
+                "Material": "Stainless Steel or SS 304 or Copper"}
+        resolver = partatts.MaterialResolver(
+            {"stainless steel": 8.0}, aliases={"ss 304": "stainless steel"})
+        self.assertEqual({"stainless steel", "ss 304", "copper"},
+                         partatts.materials(atts))
+        inputs = partatts.material_inputs(atts, resolver)
+        # the alias and the material are the same input
+        self.assertEqual(1, len(inputs))
+        self.assertEqual("stainless steel", inputs[0][0])
+        densities = {"stainless steel": 8.0}
+        self.assertAlmostEqual(
+            inputs[0][1], partatts.material_inputs(atts, densities)[0][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
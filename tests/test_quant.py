@@ -13,6 +13,21 @@ class QuantityModuleTest(unittest.TestCase):
         cm = quant.length_cm("21.21 inches minimum and 42.42 inches maximum")
         self.assertAlmostEqual(cm, 2.54 * (21.21 + 42.42) / 2)
 
+    def test_length_cm_units(self):
+        self.assertAlmostEqual(quant.length_cm("3 feet"), 3 * 30.48)
+        self.assertAlmostEqual(quant.length_cm("1/4 inches"), 0.25 * 2.54)
+        self.assertAlmostEqual(quant.length_cm("1-1/4 inches"), 1.25 * 2.54)
+        self.assertAlmostEqual(quant.length_cm("25 mm nominal"), 2.5)
+        self.assertAlmostEqual(quant.length_cm("2.5cm"), 2.5)
+        self.assertAlmostEqual(quant.length_cm("1.2 m"), 120.0)
+        self.assertAlmostEqual(
+            quant.length_cm("10 mm minimum and 20 mm maximum"), 1.5)
+        # inches are preferred over other units
+        self.assertAlmostEqual(quant.length_cm("2 feet and 3 inches"),
+                               3 * 2.54)
+        self.assertEqual(quant.length_cm("unknown"), 0.0)
+        self.assertEqual(quant.length_cm(None), 0.0)
+
     def test_ring_volume(self):
         spec = """
         Cross-Sectional Shape Style              ; TEE
@@ -30,6 +45,45 @@ class QuantityModuleTest(unittest.TestCase):
         self.assertAlmostEqual(
             vol_cm3, (math.pi / 4) * 0.180 * (1.384**2 - 1.106**2) * 2.54**3)
 
+    def test_compiled_formula(self):
+        f = quant.VolumeFormula(
+            {"Width": "a", "Thickness": "b", "Length": "c"}, "a * b * c")
+        vol = f.get_cm3({"Width": "1 inches", "thickness": "2 inches",
+                         "Length": "3 inches"})
+        self.assertIsInstance(vol, float)
+        self.assertAlmostEqual(vol, 6 * 2.54**3)
+
+        vols = f.get_cm3_batch([
+            {"Width": "1 inches", "Thickness": "2 inches", "Length": "3 inches"},
+            {"Width": "1 feet", "Thickness": "1 feet", "Length": "1 feet"}])
+        self.assertEqual(2, len(vols))
+        self.assertAlmostEqual(vols[0], 6 * 2.54**3)
+        self.assertAlmostEqual(vols[1], 30.48**3, places=4)
+
+        with self.assertRaises(ValueError):
+            quant.VolumeFormula({"Width": "a"}, "a * b")
+
+    def test_find_formula(self):
+        # the first registered formula that matches should be selected
+        bindings = {
+            "Thread Length": "0.5 inches",
+            "Fastener Length": "1.0 inches",
+            "Nominal Thread Diameter": "0.25 inches",
+            "Hole Diameter": "0.1 inches",
+            "Head Diameter": "0.4 inches",
+            "Head Height": "0.1 inches",
+            "Shoulder Diameter": "0.3 inches",
+            "Shoulder Length": "0.2 inches",
+        }
+        expected = None
+        for f in quant.VolumeFormula._formulas:
+            if f.matches(bindings):
+                expected = f
+                break
+        self.assertIsNotNone(expected)
+        self.assertIs(expected, quant.VolumeFormula.find(bindings))
+        self.assertIsNone(quant.VolumeFormula.find({"Color": "red"}))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,10 @@
+import os
+import tempfile
 import unittest
 
+import pslink.backs as backs
 import pslink.semap as semap
+import pslink.symap as symap
 
 
 class SemapTest(unittest.TestCase):
@@ -26,6 +30,237 @@ class SemapTest(unittest.TestCase):
         self.assertEqual(("milk and milk based products", 2, 2),
                          g.closest_broader("cow milk", "cheese, goat"))
 
+    def test_closest_broader_cache(self):
+        text = '''
+        "monel 400"    , "nickel alloy"^ , "copper alloy"^
+        "nickel alloy" , "alloy"^
+        "brass"        , "copper alloy"^ , "yellow brass"=
+        '''
+        g = semap.parse_text(text)
+        self.assertEqual({"brass", "yellow brass"}, g.same_of("yellow brass"))
+        self.assertEqual({"copper alloy"}, g.broader_of("yellow brass"))
+        self.assertEqual(("copper alloy", 1, 1),
+                         g.closest_broader("monel 400", "yellow brass"))
+        self.assertEqual(("alloy", 2, 0),
+                         g.closest_broader("monel 400", "alloy"))
+        self.assertEqual((), g.closest_broader("brass", "alloy"))
+
+        # adding a relation resets the cached closures
+        g.add_relation(semap.Relation("copper alloy", "alloy",
+                                      semap.RelationType.broader))
+        self.assertEqual(("alloy", 2, 0),
+                         g.closest_broader("brass", "alloy"))
+        g.add_relation(semap.Relation("alloy", "Legierung",
+                                      semap.RelationType.same))
+        self.assertEqual({"alloy", "Legierung"}, g.same_of("alloy"))
+        self.assertEqual(("Legierung", 2, 0),
+                         g.closest_broader("yellow brass", "Legierung"))
+
+    def test_parse_text(self):
+        text = '''
+        # a comment
+        "steel"        , "ferrous metal"^ , "iron"<
+        "stainless steel" , "steel"^, "steel"= , "corrosion resisting steel"=
+        "open quote"   , "not closed^
+        ""             , "ignored"^
+        '''
+        g = semap.parse_text(text)
+        self.assertEqual({"steel", "ferrous metal", "iron", "stainless steel",
+                          "corrosion resisting steel"}, g.nodes)
+        # the duplicate same-as relation to steel is ignored
+        rels = [(r.target, r.rtype) for r in g.relations_of("stainless steel")]
+        self.assertEqual([("steel", semap.RelationType.broader),
+                          ("corrosion resisting steel",
+                           semap.RelationType.same)], rels)
+        rels = [(r.target, r.rtype) for r in g.relations_of("steel")]
+        self.assertEqual([("ferrous metal", semap.RelationType.broader),
+                          ("iron", semap.RelationType.derived),
+                          ("stainless steel", semap.RelationType.narrower)],
+                         rels)
+
+    def test_iter_semapl(self):
+        text = '''
+        "steel"           , "ferrous metal"^
+        "stainless steel" , "steel"^, "corrosion resisting steel"=
+        "steel product"   , "steel"<
+        '''
+        g = semap.parse_text(text)
+        out = "".join(semap.iter_semapl(g))
+        # each broader relation is written only once
+        self.assertEqual(1, out.count('"stainless steel" , "steel"^'))
+        self.assertEqual(1, out.count('"steel" , "ferrous metal"^'))
+        self.assertTrue(out.startswith(
+            '# corrosion resisting steel\n'
+            '"corrosion resisting steel" , "stainless steel"=\n\n'))
+        # parsing the output again gives the same graph
+        g2 = semap.parse_text(out)
+        self.assertEqual(g.nodes, g2.nodes)
+        self.assertEqual(sorted(out.splitlines()),
+                         sorted("".join(semap.iter_semapl(g2)).splitlines()))
+
+    def test_find_nodes(self):
+        text = '''
+        "stainless steel"     , "steel"^
+        "steel comp 302"      , "stainless steel 302"=, "stainless steel"^
+        "copper alloy"        , "alloy"^, "copper"^
+        "polytetrafluoroethylene" , "PTFE"= , "plastic"^
+        '''
+        g = semap.parse_text(text)
+
+        # the indexed search must give the same result as a full scan
+        def full_scan(a, b):
+            return symap.words_equality(a, b)
+
+        for name in ["steel", "Stainless Steel 302", "alloy, copper",
+                     "ptfe", "wood", "at the"]:
+            indexed = sorted(g.find_nodes(name, symap.words_equality))
+            scanned = sorted(g.find_nodes(name, full_scan))
+            self.assertEqual(scanned, indexed)
+        self.assertEqual(
+            {"steel", "stainless steel", "steel comp 302",
+             "stainless steel 302"}, g.candidate_nodes("steel"))
+
+    def test_link_products_workers(self):
+        text = '''
+        "stainless steel"     , "steel"^
+        "copper alloy"        , "alloy"^, "copper"^
+        "polyethylene"        , "plastic"^, "PE"=
+        '''
+        infos = []
+        for name in ["steel, generic", "Steel, stainless 304",
+                     "copper, primary, at refinery", "polyethylene, HDPE",
+                     "polyethylene, LDPE", "wood, hardwood"]:
+            info = backs.ProductInfo()
+            info.product_name = name
+            infos.append(info)
+
+        serial = semap.parse_text(text)
+        serial.link_products(infos)
+        parallel = semap.parse_text(text)
+        parallel.link_products(infos, workers=2)
+        self.assertEqual(serial._syn_factors, parallel._syn_factors)
+        self.assertEqual(serial._product_infos, parallel._product_infos)
+        self.assertEqual(2, len(parallel._product_infos["polyethylene"]))
+
+    def test_csr_find_products(self):
+        text = '''
+        "stainless steel" , "steel"^, "corrosion resisting steel"=
+        "steel"           , "ferrous metal"^
+        "steel product"   , "steel"<
+        "cast iron"       , "ferrous metal"^
+        '''
+        g = semap.parse_text(text)
+        for node, uuid, factor in [("steel", "p1", 0.5),
+                                   ("ferrous metal", "p2", 1.0),
+                                   ("cast iron", "p3", 1.0)]:
+            g._product_infos[node] = [backs.ProductInfo(process_uuid=uuid)]
+            g._syn_factors[node] = factor
+        c = semap.CsrGraph.from_graph(g)
+        for name in ["stainless steel", "steel product", "cast iron",
+                     "ferrous", "wood"]:
+            expected = sorted(p.process_uuid for p in g.find_products(name))
+            actual = sorted(p.process_uuid for p in c.find_products(name))
+            self.assertEqual(expected, actual)
+        self.assertEqual(["p2"], [p.process_uuid for p in
+                                  c.find_products("stainless steel")])
+
+    def test_csr_product_order(self):
+        g = semap.parse_text('"steel" , "stahl"=')
+        for node, uuid, factor in [("steel", "p1", 0.9995),
+                                   ("stahl", "p2", 1.0)]:
+            g._product_infos[node] = [backs.ProductInfo(process_uuid=uuid)]
+            g._syn_factors[node] = factor
+        c = semap.CsrGraph.from_graph(g)
+        # the products are sorted by their scores
+        self.assertEqual(["p2", "p1"], [p.process_uuid for p in
+                                        c.find_products("steel")])
+
+    def test_csr_from_binary(self):
+        text = '''
+        "stainless steel" , "steel"^, "corrosion resisting steel"=
+        "steel"           , "ferrous metal"^
+        "steel product"   , "steel"<
+        '''
+        g = semap.parse_text(text)
+        g._product_infos["steel"] = [backs.ProductInfo(process_uuid="p1")]
+        g._syn_factors["steel"] = 0.5
+        with tempfile.TemporaryDirectory() as tmp:
+            fpath = os.path.join(tmp, "graph.bin")
+            semap.save_binary(g, fpath)
+            with semap.load_binary(fpath) as b:
+                c = semap.CsrGraph.from_binary(b)
+                m = b._mmap
+            # the CSR graph does not hold views of the mapped file
+            self.assertTrue(m.closed)
+            for name in ["stainless steel", "steel product", "wood"]:
+                self.assertEqual(
+                    sorted(p.process_uuid for p in g.find_products(name)),
+                    sorted(p.process_uuid for p in c.find_products(name)))
+
+    def test_find_products_many(self):
+        text = '''
+        "stainless steel" , "steel"^, "corrosion resisting steel"=
+        "steel"           , "ferrous metal"^
+        "steel product"   , "steel"<
+        "cast iron"       , "ferrous metal"^
+        '''
+        g = semap.parse_text(text)
+        for node, uuids, factor in [("steel", ["p1"], 0.5),
+                                    ("ferrous metal", ["p2", "p4"], 1.0),
+                                    ("cast iron", ["p3"], 1.0)]:
+            g._product_infos[node] = [backs.ProductInfo(process_uuid=uuid)
+                                      for uuid in uuids]
+            g._syn_factors[node] = factor
+        names = ["stainless steel", "Stainless Steel", "steel product",
+                 "cast iron", "ferrous", "wood"]
+        matches = g.find_products_many(names)
+        self.assertEqual(names, list(matches.keys()))
+        # the scores are set on copies of the linked products
+        for infos in g._product_infos.values():
+            for info in infos:
+                self.assertFalse(hasattr(info, "score"))
+        for name in names:
+            expected = [(p.process_uuid, p.score)
+                        for p in g.find_products(name)]
+            actual = [(p.process_uuid, p.score) for p in matches[name]]
+            self.assertEqual(expected, actual)
+        self.assertEqual(["p2", "p4"],
+                         [p.process_uuid for p in matches["ferrous"]])
+
+    def test_binary_format(self):
+        text = '''
+        "stainless steel" , "steel"^, "corrosion resisting steel"=
+        "steel product"   , "steel"<
+        "Stahl, rostfrei" , "stainless steel"=
+        '''
+        g = semap.parse_text(text)
+        info = backs.ProductInfo(process_uuid="p1", product_name="steel, cr")
+        g._product_infos["stainless steel"] = [info]
+        g._syn_factors["stainless steel"] = 0.5
+
+        with tempfile.TemporaryDirectory() as tmp:
+            fpath = os.path.join(tmp, "graph.bin")
+            semap.save_binary(g, fpath)
+            with semap.load_binary(fpath) as b:
+                self.assertEqual(len(g.nodes), len(b))
+                self.assertEqual(sorted(g.nodes), list(b.nodes()))
+                self.assertEqual(-1, b.node_id("iron"))
+                for node in g.nodes:
+                    self.assertEqual(
+                        [(r.target, r.rtype) for r in g.relations_of(node)],
+                        [(r.target, r.rtype) for r in b.relations_of(node)])
+                products = b.products_of("stainless steel")
+                self.assertEqual([info.as_dict()],
+                                 [p.as_dict() for p in products])
+                g2 = b.to_graph()
+                n = len(b.edge_targets)
+                targets = b.edge_targets[1:]
+            # a view that outlives the graph does not fail the close
+            self.assertIsNone(b.edge_targets)
+            self.assertEqual(n - 1, len(targets))
+            self.assertEqual("".join(semap.iter_semapl(g)),
+                             "".join(semap.iter_semapl(g2)))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -22,6 +22,28 @@ class SymapTest(unittest.TestCase):
         for e in expected:
             self.assertTrue(e in r)
 
+    def test_keywords_cache(self):
+        p = "Zylonite sheet, at plant"
+        r = symap.keywords(p)
+        self.assertEqual({"zylonite", "sheet", "plant"}, r)
+        # the returned set must not be shared with the cache
+        r.add("foo")
+        hits = symap.keywords_cache_info().hits
+        self.assertEqual({"zylonite", "sheet", "plant"}, symap.keywords(p))
+        self.assertEqual(hits + 1, symap.keywords_cache_info().hits)
+        self.assertEqual({"zylonite", "sheet"},
+                         symap.keywords(p, strip_lci_terms=True))
+        # adding a stopword needs to clear the cache; the stopwords are
+        # restored after the test
+        stopwords = symap.stopwords()
+
+        def restore():
+            symap._stop_words = stopwords
+            symap._keywords.cache_clear()
+        self.addCleanup(restore)
+        symap.add_stopword("Zylonite")
+        self.assertEqual({"sheet", "plant"}, symap.keywords(p))
+
     def test_best_match(self):
         match = symap.best_match("stainless steel", [
             "World Stainless Steel. 2005.  World Stainless Steel LCI",
@@ -30,6 +52,42 @@ class SymapTest(unittest.TestCase):
             "Stainless steel; Manufacture; Production mix, at plant; 316 2B"])
         self.assertEqual(match, "Steel, stainless 304")
 
+    def test_lci_name_index(self):
+        lci_names = [
+            "Steel, stainless 304",
+            "steel, generic",
+            "Aluminium, primary, at plant",
+            "polyethylene, HDPE, granulate, at plant",
+            "Copper; primary; at refinery"]
+        index = symap.LciNameIndex(lci_names)
+        for name in ["stainless steel", "aluminium", "HDPE", "wood"]:
+            expected = []
+            for pos, lci_name in enumerate(lci_names):
+                score = symap.compare_with_lci_name(name, lci_name)
+                if score > 0:
+                    expected.append((pos, score))
+            self.assertEqual(expected, index.compare(name))
+
+    def test_best_match_many(self):
+        phrases = [
+            "at the",
+            "steel, generic",
+            "Steel, stainless 304",
+            "Stainless steel; Manufacture; Production mix, at plant; 316 2B"]
+        pos, score = symap.best_match_many("stainless steel", phrases)
+        self.assertEqual(2, pos)
+        self.assertAlmostEqual(
+            symap.words_similarity(symap.keywords("stainless steel"),
+                                   symap.keywords(phrases[2])), score)
+        self.assertEqual((-1, 0.0), symap.best_match_many("at", phrases))
+        self.assertEqual((-1, 0.0), symap.best_match_many("steel", ["at"]))
+
+    def test_similarity_matrix(self):
+        mat = symap.similarity_matrix(["steel", "car"], ["steel", "bar"])
+        self.assertEqual((2, 2), mat.shape)
+        self.assertAlmostEqual(1.0, mat[0, 0])
+        self.assertAlmostEqual(symap.similarity("car", "bar"), mat[1, 1])
+
 
 if __name__ == "__main__":
     unittest.main()
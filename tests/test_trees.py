@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+import openpyxl
+
+import pslink.trees as trees
+
+
+ROWS = [
+    ["Level", "Part", "", "Qty", "Name", "Parent"],
+    [0, "A-1", "", 1, "Assembly", ""],
+    [1, "B/2", "", 4, "Bolt", "A-1"],
+    [1, 1234, "", "n/a", "Nut", "A-1"],
+    [None, None, None, None, None, None],
+    [1, "C-3", "", 1, "after the empty row", "A-1"],
+]
+
+
+class TreesTest(unittest.TestCase):
+
+    def test_read_files(self):
+        with tempfile.TemporaryDirectory() as folder:
+            wb = openpyxl.Workbook()
+            ws = wb.active
+            ws.title = "tree"
+            for row in ROWS:
+                ws.append(row)
+            wb.save(os.path.join(folder, "a.xlsx"))
+            with open(os.path.join(folder, "b.csv"), "w") as f:
+                for row in ROWS:
+                    f.write(",".join("" if v is None else str(v)
+                                     for v in row) + "\n")
+            with open(os.path.join(folder, "c.tsv"), "w") as f:
+                f.write("Level\tPart\n1\tX-9\n")
+            with open(os.path.join(folder, "densities.txt"), "w") as f:
+                f.write("steel ; 7.9\n")
+            # XLS files are only read when the reader is registered
+            with open(os.path.join(folder, "d.xls"), "wb") as f:
+                f.write(b"")
+
+            files = trees.find_files(folder)
+            self.assertEqual(["a.xlsx", "b.csv", "c.tsv"],
+                             [os.path.basename(f) for f in files])
+
+            sheets = trees.read_all(files)
+            self.assertEqual(["a.xlsx/tree", "b.csv/b", "c.tsv/c"],
+                             [s.key for s in sheets])
+            xlsx, csv, tsv = sheets
+            # numbers are formatted like in xlrd
+            self.assertEqual(["A-1", "B/2", "1234.0"],
+                             [r.part_number for r in xlsx.rows])
+            self.assertEqual(["A-1", "B/2", "1234"],
+                             [r.part_number for r in csv.rows])
+            for sheet in (xlsx, csv):
+                self.assertEqual(3, len(sheet.rows))
+                nut = sheet.rows[2]
+                self.assertEqual((3, "Nut", "A-1", "n/a"),
+                                 (nut.row, nut.name, nut.parent, nut.quantity))
+            self.assertEqual("X-9", tsv.rows[0].part_number)
+            self.assertEqual("", tsv.rows[0].parent)
+
+            # parsing in worker processes gives the same result
+            self.assertEqual(sheets, trees.read_all(files, workers=2))
+
+            # the rows of the lazy readers are iterators
+            lazy = next(trees.iter_sheets(files[1]))
+            self.assertEqual(csv.rows, list(lazy.rows))
+
+            trees.register_reader(".xls", trees.read_xls)
+            self.addCleanup(trees._READERS.pop, ".xls")
+            self.assertEqual(["a.xlsx", "b.csv", "c.tsv", "d.xls"],
+                             [os.path.basename(f)
+                              for f in trees.find_files(folder)])
+
+    def test_read_all_workers(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for i in range(4):
+                wb = openpyxl.Workbook()
+                wb.remove(wb.active)
+                for j in range(2):
+                    ws = wb.create_sheet("tree%i" % j)
+                    ws.append(ROWS[0])
+                    ws.append([0, "R-%i-%i" % (i, j), "", 1, "Root", ""])
+                    for k in range(20):
+                        ws.append([1, "P-%i" % k, "", k, "Part %i" % k,
+                                   "R-%i-%i" % (i, j)])
+                wb.save(os.path.join(folder, "tree%i.xlsx" % i))
+            files = trees.find_files(folder)
+            serial = trees.read_all(files)
+            self.assertEqual(8, len(serial))
+            self.assertEqual(21, len(serial[0].rows))
+            # the sheets are in the same order with the same rows
+            self.assertEqual(serial, trees.read_all(files, workers=3))
+
+    def test_csv_encoding(self):
+        with tempfile.TemporaryDirectory() as folder:
+            fpath = os.path.join(folder, "tree.csv")
+            with open(fpath, "w", encoding="cp1252") as f:
+                f.write("Level,Part,,Qty,Name,Parent\n1,A-1,,1,Rädchen,\n")
+            sheet = next(trees.read_csv(fpath, encoding="cp1252"))
+            self.assertEqual(["Rädchen"], [r.name for r in sheet.rows])
+
+
+if __name__ == "__main__":
+    unittest.main()